@@ -1,10 +1,12 @@
 
 from __future__ import annotations
 
-import asyncio
 import logging
+import time
+from typing import List
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.typing import ConfigType
 from homeassistant.const import CONF_HOST, CONF_PORT
 
@@ -12,47 +14,110 @@ from .const import (
     DOMAIN,
     PLATFORMS,
     CONF_UNIT_ID,
+    CONF_UNIT_IDS,
     CONF_SCAN_INTERVAL,
+    CONF_LEGACY_SLAVE,
+    CONF_LEGACY_DEVICE_NAME,
+    LEGACY_MIGRATED_ADDRESSES,
+    LEGACY_REMOVED_ADDRESSES,
+    CONF_MAX_GAP,
+    CONF_MAX_IN_FLIGHT,
+    CONF_FRAMING,
+    CONF_PROFILE,
+    CONF_ADAPTIVE,
+    CONF_DERIVED,
+    CONF_WINDOW,
+    READ_REGISTERS_TTL_S,
+    DEFAULT_UNIT_ID,
     DEFAULT_SCAN_INTERVAL,
+    DEFAULT_MAX_GAP,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_FRAMING,
+    DEFAULT_PROFILE,
+    DEFAULT_ADAPTIVE,
+    DEFAULT_DERIVED,
+    DEFAULT_WINDOW,
 )
-from .modbus_client import ModbusTcpClient
+from .gateway import async_get_gateway, async_release_gateway
 from .coordinator import OrnoCoordinator
+from .profiles import async_get_profile
+from .range_reader import RegisterRangeReader
+from .services import async_setup_services
+from .storage import RegisterTypeCache, ValueSnapshot
+from .websocket import async_setup_websocket
 
 _LOGGER = logging.getLogger(__name__)
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     hass.data.setdefault(DOMAIN, {})
+    await async_setup_services(hass)
+    async_setup_websocket(hass)
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Konfiguracja wpisu bez komunikacji Modbus.
+
+    Encje startują z wartościami z migawki, a połączenie i pierwszy odczyt odbywają się
+    w tle, więc czas konfiguracji nie zależy od stanu bramki ani liczników.
+    """
+    started = time.monotonic()
     hass.data.setdefault(DOMAIN, {})
 
     host = entry.data[CONF_HOST]
     port = entry.data[CONF_PORT]
-    unit_id = entry.data.get(CONF_UNIT_ID, 2)
+    unit_ids = entry.data.get(CONF_UNIT_IDS) or [entry.data.get(CONF_UNIT_ID, DEFAULT_UNIT_ID)]
     scan_interval = entry.data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
+    max_gap = entry.data.get(CONF_MAX_GAP, DEFAULT_MAX_GAP)
+    max_in_flight = entry.data.get(CONF_MAX_IN_FLIGHT, DEFAULT_MAX_IN_FLIGHT)
+    framing = entry.data.get(CONF_FRAMING, DEFAULT_FRAMING)
+    profile = await async_get_profile(hass, entry.data.get(CONF_PROFILE, DEFAULT_PROFILE))
 
-    client = ModbusTcpClient(host, port=port, unit_id=unit_id)
-
+    gateway = async_get_gateway(hass, host, port, max_in_flight=max_in_flight, framing=framing)
+    register_cache = RegisterTypeCache(hass, entry.entry_id)
+    snapshot = ValueSnapshot(hass, entry.entry_id)
+    # Referencja bramki jest zwalniana przy każdym błędzie dalszej konfiguracji -
+    # inaczej połączenie współdzielone z innymi wpisami nigdy nie zostałoby zamknięte.
     try:
-        await client.connect()
-    except Exception as err:
-        _LOGGER.warning("ORNO: wstępne połączenie Modbus nieudane: %s", err)
+        clients = {unit_id: gateway.unit(unit_id) for unit_id in unit_ids}
+        await register_cache.async_load()
+        restored = await snapshot.async_load()
+
+        coordinator = OrnoCoordinator(
+            hass, clients, profile, scan_interval_s=scan_interval, max_gap=max_gap,
+            register_cache=register_cache, snapshot=snapshot,
+            adaptive=entry.data.get(CONF_ADAPTIVE, DEFAULT_ADAPTIVE),
+            derived=entry.data.get(CONF_DERIVED, DEFAULT_DERIVED),
+            window_s=entry.data.get(CONF_WINDOW, DEFAULT_WINDOW),
+            statistic_prefix=f"{DOMAIN}:{entry.entry_id}",
+        )
+        coordinator.restore(restored)
 
-    coordinator = OrnoCoordinator(hass, client, scan_interval_s=scan_interval)
-    await coordinator.async_config_entry_first_refresh()
+        hass.data[DOMAIN][entry.entry_id] = {
+            "clients": clients,
+            "gateway": gateway,
+            "register_cache": register_cache,
+            "entry_data": entry.data,
+            "coordinator": coordinator,
+            "range_reader": RegisterRangeReader(clients, READ_REGISTERS_TTL_S),
+        }
 
-    hass.data[DOMAIN][entry.entry_id] = {
-        "client": client,
-        "lock": asyncio.Lock(),
-        "entry_data": entry.data,
-        "coordinator": coordinator,
-    }
+        await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    except Exception:
+        hass.data[DOMAIN].pop(entry.entry_id, None)
+        await async_release_gateway(hass, gateway)
+        raise
+    # Połączenie nawiązuje pierwszy odczyt; niedziałający licznik oznacza encje jako
+    # niedostępne, ale nie blokuje ani nie przerywa konfiguracji.
+    entry.async_create_background_task(
+        hass, coordinator.async_refresh(), f"{DOMAIN}_first_refresh_{entry.entry_id}"
+    )
 
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    setup_ms = round((time.monotonic() - started) * 1000, 1)
+    hass.data[DOMAIN][entry.entry_id]["setup_ms"] = setup_ms
     _LOGGER.info(
-        "ORNO: entry %s skonfigurowany (%s:%s, unit=%s, interval=%ss)",
-        entry.entry_id, host, port, unit_id, scan_interval
+        "ORNO: entry %s skonfigurowany w %s ms (%s %s:%s, unit=%s, interval=%ss, migawka: %s)",
+        entry.entry_id, setup_ms, profile.model, host, port, ",".join(map(str, unit_ids)),
+        scan_interval, "tak" if restored else "nie",
     )
     return True
 
@@ -60,10 +125,67 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     data = hass.data[DOMAIN].pop(entry.entry_id, None)
 
-    if data and "client" in data:
+    if data and "gateway" in data:
         try:
-            await data["client"].close()
+            await async_release_gateway(hass, data["gateway"])
         except Exception as err:
             _LOGGER.debug("ORNO: błąd przy zamykaniu klienta: %s", err)
 
     return unload_ok
+
+async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Migracja wpisów v1, w tym wpisów starej integracji (pymodbus, klucz "slave")."""
+    if entry.version > 2:
+        return False
+
+    if entry.version == 1:
+        data = dict(entry.data)
+        if CONF_LEGACY_SLAVE in data:
+            slave = data.pop(CONF_LEGACY_SLAVE)
+            data.pop(CONF_LEGACY_DEVICE_NAME, None)
+            data[CONF_UNIT_ID] = slave
+            data[CONF_SCAN_INTERVAL] = entry.options.get(
+                CONF_SCAN_INTERVAL, data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
+            )
+
+            # Stare encje miały unique_id "<entry>_<slave>_<adres>", nowe "<entry>_<adres>".
+            # Encje o zmienionej jednostce lub znaczeniu zachowują stare unique_id (i historię
+            # w starych jednostkach): żadna encja ich nie obsługuje, więc zostają niedostępne
+            # do ręcznego usunięcia, a nowe powstają od zera.
+            legacy_prefix = f"{entry.entry_id}_{slave}_"
+            registry = er.async_get(hass)
+            kept: List[str] = []
+            for entity_entry in er.async_entries_for_config_entry(registry, entry.entry_id):
+                if not entity_entry.unique_id.startswith(legacy_prefix):
+                    continue
+                address = entity_entry.unique_id[len(legacy_prefix):]
+                try:
+                    number = int(address)
+                except ValueError:
+                    number = None
+                if number in LEGACY_REMOVED_ADDRESSES:
+                    registry.async_remove(entity_entry.entity_id)
+                elif number in LEGACY_MIGRATED_ADDRESSES:
+                    registry.async_update_entity(
+                        entity_entry.entity_id, new_unique_id=f"{entry.entry_id}_{address}"
+                    )
+                else:
+                    kept.append(entity_entry.entity_id)
+            if kept:
+                _LOGGER.warning(
+                    "ORNO: encje starej integracji o zmienionej jednostce lub znaczeniu zostają niedostępne "
+                    "(z dotychczasową historią) i można je usunąć: %s",
+                    ", ".join(kept),
+                )
+
+        unique_id = entry.unique_id or f"{data[CONF_HOST]}:{data[CONF_PORT]}:{data[CONF_UNIT_ID]}"
+        hass.config_entries.async_update_entry(
+            entry, data=data, options={}, unique_id=unique_id, version=2
+        )
+        _LOGGER.info("ORNO: zmigrowano wpis %s do wersji 2", entry.entry_id)
+
+    return True
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await RegisterTypeCache(hass, entry.entry_id).async_remove()
+    await ValueSnapshot(hass, entry.entry_id).async_remove()
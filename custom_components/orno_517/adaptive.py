@@ -0,0 +1,88 @@
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable
+
+# Zakres okresu klasy względem okresu nominalnego (rate / _RANGE .. rate * _RANGE), nie krócej niż 1 s.
+_RANGE = 4.0
+_MIN_PERIOD_S = 1.0
+# Zmiana poza tolerancją skraca okres o połowę, spokojny odczyt wydłuża go o 25 %.
+_TIGHTEN = 0.5
+_STRETCH = 1.25
+# Obciążenie bramki: mnożnik wszystkich okresów rośnie x2 przy przeciążeniu i wraca do 1 o 20 % na cykl.
+_MAX_LOAD = 4.0
+_LOAD_DECAY = 0.8
+# Przeciążenie: czas zapytania > 3x najlepszego zaobserwowanego, >10 % błędów
+# albo cykl trwający ponad połowę najkrótszego okresu.
+_LATENCY_FACTOR = 3.0
+_ERROR_RATIO = 0.1
+_BUSY_FRACTION = 0.5
+# Najlepszy czas zapytania powoli "zapomina" stare minimum (np. po zmianie bramki).
+_LATENCY_FLOOR_DRIFT = 1.01
+
+
+class AdaptiveSchedule:
+    """Zmienne okresy klas częstotliwości w trybie adaptacyjnym.
+
+    Każda klasa (okres nominalny z profilu lub scan_interval) ma własny bieżący okres:
+    skracany w stronę podłogi, gdy wartości klasy zmieniają się szybciej niż tolerancja,
+    i wydłużany, gdy kolejne odczyty są stabilne. Niezależnie od tego wspólny mnożnik
+    obciążenia wydłuża wszystkie okresy, gdy opóźnienia lub błędy wskazują na przeciążoną bramkę.
+    """
+
+    def __init__(self, rates: Iterable[float]) -> None:
+        self._periods: Dict[float, float] = {rate: rate for rate in rates}
+        self._floors = {rate: max(_MIN_PERIOD_S, rate / _RANGE) for rate in self._periods}
+        self._ceilings = {rate: rate * _RANGE for rate in self._periods}
+        self.load = 1.0
+        self._latency_floor_ms: float | None = None
+
+    def period(self, rate: float) -> float:
+        return self._periods[rate] * self.load
+
+    def tick(self) -> float:
+        return min(self.period(rate) for rate in self._periods)
+
+    def observe_class(self, rate: float, volatile: bool) -> None:
+        current = self._periods[rate]
+        if volatile:
+            self._periods[rate] = max(self._floors[rate], current * _TIGHTEN)
+        else:
+            self._periods[rate] = min(self._ceilings[rate], current * _STRETCH)
+
+    def observe_poll(self, duration_ms: float, requests: int, errors: int) -> None:
+        if not requests:
+            return
+        per_request = duration_ms / requests
+        floor = self._latency_floor_ms
+        floor = per_request if floor is None else min(per_request, floor * _LATENCY_FLOOR_DRIFT)
+        self._latency_floor_ms = floor
+        saturated = (
+            per_request > floor * _LATENCY_FACTOR
+            or errors / requests > _ERROR_RATIO
+            or duration_ms / 1000 > self.tick() * _BUSY_FRACTION
+        )
+        if saturated:
+            self.load = min(_MAX_LOAD, self.load * 2)
+        else:
+            self.load = max(1.0, self.load * _LOAD_DECAY)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "periods_s": {str(rate): round(self.period(rate), 2) for rate in sorted(self._periods)},
+            "load": round(self.load, 2),
+            "latency_floor_ms": round(self._latency_floor_ms, 3) if self._latency_floor_ms else None,
+        }
+
+
+def change_tolerance(d: Dict[str, Any], pct: float) -> tuple[float, float] | None:
+    """(względna, bezwzględna) tolerancja zmiany dla definicji; None = nie wpływa na okres.
+
+    Liczniki narastające (energia) zmieniają się zawsze, więc nie są brane pod uwagę.
+    Bezwzględne minimum to martwa strefa albo jeden krok wyświetlanej precyzji.
+    """
+    if d.get("state_class") == "total_increasing":
+        return None
+    precision = d.get("precision")
+    absolute = d.get("deadband") or (10 ** -precision if precision is not None else 0.0)
+    return pct / 100, float(absolute)
@@ -0,0 +1,114 @@
+
+from __future__ import annotations
+
+import math
+from array import array
+from typing import Any, Dict, List, Sequence
+
+
+class BurstBuffer:
+    """Prealokowany bufor próbek serii (jedna tablica `array('d')` na rejestr + znaczniki czasu).
+
+    Próbki nie są trzymane w słownikach: każdy cykl zapisuje jedną liczbę do każdej
+    tablicy pod wspólnym indeksem. Brak wartości w danym cyklu oznaczany jest NaN.
+    Przy przepełnieniu pojemność jest podwajana.
+    """
+
+    __slots__ = ("names", "t", "_columns", "size")
+
+    def __init__(self, names: Sequence[str], capacity: int) -> None:
+        capacity = max(16, int(capacity))
+        self.names = list(names)
+        self.t = array("d", bytes(8 * capacity))
+        self._columns = [array("d", [math.nan]) * capacity for _ in self.names]
+        self.size = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.t)
+
+    def _grow(self) -> None:
+        extra = self.capacity
+        self.t.extend(array("d", bytes(8 * extra)))
+        for col in self._columns:
+            col.extend(array("d", [math.nan]) * extra)
+
+    def append(self, t: float, values: Dict[int, float]) -> None:
+        """Dodaje próbkę; `values` mapuje indeks kolumny na wartość."""
+        if self.size == self.capacity:
+            self._grow()
+        i = self.size
+        self.t[i] = t
+        for col, value in values.items():
+            self._columns[col][i] = value
+        self.size = i + 1
+
+    @property
+    def rate_hz(self) -> float:
+        if self.size < 2:
+            return 0.0
+        span = self.t[self.size - 1] - self.t[0]
+        return round((self.size - 1) / span, 2) if span > 0 else 0.0
+
+    def column(self, index: int) -> array:
+        return self._columns[index][:self.size]
+
+    def summary(self, precision: int = 4) -> Dict[str, Any]:
+        """Min/max/średnia i surowe serie (NaN pominięte w statystykach, jako None w serii)."""
+        registers: Dict[str, Any] = {}
+        for index, name in enumerate(self.names):
+            col = self.column(index)
+            valid = [v for v in col if v == v]
+            registers[name] = {
+                "count": len(valid),
+                "min": min(valid) if valid else None,
+                "max": max(valid) if valid else None,
+                "mean": round(sum(valid) / len(valid), precision) if valid else None,
+                "values": [v if v == v else None for v in col],
+            }
+        return {
+            "samples": self.size,
+            "rate_hz": self.rate_hz,
+            "t": [round(v, precision) for v in self.t[:self.size]],
+            "registers": registers,
+        }
+
+
+def event_data(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Wynik serii bez surowych serii - do zdarzenia na szynie (trafia też do bazy recordera).
+
+    Zostają statystyki rejestrów i znaczniki czasu: początek i koniec serii (unix)
+    oraz czas pierwszej i ostatniej próbki [s od startu].
+    """
+    data = {k: v for k, v in result.items() if k not in ("t", "registers")}
+    t = result["t"]
+    data["t_first"] = t[0] if t else None
+    data["t_last"] = t[-1] if t else None
+    data["registers"] = {
+        name: {k: v for k, v in stats.items() if k != "values"}
+        for name, stats in result["registers"].items()
+    }
+    return data
+
+
+def select_defs(defs: Sequence[Dict[str, Any]], registers: Sequence[Any]) -> List[Dict[str, Any]]:
+    """Wybiera definicje po nazwie lub adresie; ValueError dla nieznanych pozycji."""
+    by_key: Dict[str, Dict[str, Any]] = {}
+    for d in defs:
+        by_key[d["name"]] = d
+        by_key[str(d["address"])] = d
+    selected: List[Dict[str, Any]] = []
+    for reg in registers:
+        key = str(reg).strip()
+        d = by_key.get(key)
+        if d is None:
+            try:
+                # Adres może być podany szesnastkowo, jak w plikach profili ("0x0100").
+                d = by_key.get(str(int(key, 0)))
+            except ValueError:
+                pass
+        if d is None:
+            raise ValueError(reg)
+        if d not in selected:
+            selected.append(d)
+    return selected
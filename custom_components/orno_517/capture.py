@@ -0,0 +1,210 @@
+
+from __future__ import annotations
+
+import asyncio
+import struct
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+from .modbus_client import (
+    FRAMING_RTU_OVER_TCP,
+    FRAMING_TCP,
+    ModbusConnectionError,
+    ModbusError,
+    ModbusTcpClient,
+)
+
+# Format pliku: nagłówek (magic, ramkowanie, czas startu unix), potem rekordy
+# (kierunek, czas od startu [s], długość) + surowe bajty z sieci (MBAP albo RTU z CRC).
+# Bit FLAG_INVALID w polu kierunku oznacza bajty odpowiedzi odrzucone przy parsowaniu.
+CAPTURE_MAGIC = b"ORNOCAP1"
+_HEADER = struct.Struct(">8sBd")
+_RECORD = struct.Struct(">BdH")
+_FRAMING_CODES = {FRAMING_TCP: 0, FRAMING_RTU_OVER_TCP: 1}
+
+DIRECTION_REQUEST = 0
+DIRECTION_RESPONSE = 1
+FLAG_INVALID = 0x80
+
+DEFAULT_CAPTURE_BYTES = 1024 * 1024
+
+
+class FrameCapture:
+    """Bufor pierścieniowy ramek Modbus z limitem rozmiaru.
+
+    Rekordy są od razu kodowane do postaci binarnej, więc zapis to jedno `struct.pack`
+    i dopisanie do kolejki; po przekroczeniu `max_bytes` usuwane są najstarsze ramki.
+    """
+
+    __slots__ = ("framing", "max_bytes", "started", "started_wall", "size", "dropped", "_records")
+
+    def __init__(self, framing: str = FRAMING_TCP, max_bytes: int = DEFAULT_CAPTURE_BYTES) -> None:
+        self.framing = framing
+        self.max_bytes = max(_RECORD.size + 260, int(max_bytes))
+        self.started = time.monotonic()
+        self.started_wall = time.time()
+        self.size = 0
+        self.dropped = 0
+        self._records: Deque[bytes] = deque()
+
+    @property
+    def frames(self) -> int:
+        return len(self._records)
+
+    def add(self, direction: int, frame: bytes) -> None:
+        record = _RECORD.pack(direction, time.monotonic() - self.started, len(frame)) + frame
+        self._records.append(record)
+        self.size += len(record)
+        while self.size > self.max_bytes:
+            self.size -= len(self._records.popleft())
+            self.dropped += 1
+
+    def add_request(self, frame: bytes) -> None:
+        self.add(DIRECTION_REQUEST, frame)
+
+    def add_response(self, frame: bytes, invalid: bool = False) -> None:
+        self.add(DIRECTION_RESPONSE | FLAG_INVALID if invalid else DIRECTION_RESPONSE, frame)
+
+    def dump(self) -> bytes:
+        header = _HEADER.pack(CAPTURE_MAGIC, _FRAMING_CODES[self.framing], self.started_wall)
+        return header + b"".join(self._records)
+
+    def write(self, path: str) -> int:
+        """Zapisuje nagranie do pliku (blokujące - w Home Assistant przez executor)."""
+        data = self.dump()
+        with open(path, "wb") as f:
+            f.write(data)
+        return len(data)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "framing": self.framing,
+            "frames": self.frames,
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "dropped": self.dropped,
+        }
+
+
+def parse_capture(data: bytes) -> Tuple[str, List[Tuple[int, float, bytes, bool]]]:
+    """Dekoduje plik nagrania do (ramkowanie, [(kierunek, czas [s], ramka, odrzucona)]).
+
+    ValueError, gdy plik jest uszkodzony.
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("Plik nagrania jest za krótki")
+    magic, code, _ = _HEADER.unpack_from(data)
+    if magic != CAPTURE_MAGIC:
+        raise ValueError("To nie jest nagranie ORNO (zły nagłówek)")
+    framings = {v: k for k, v in _FRAMING_CODES.items()}
+    if code not in framings:
+        raise ValueError(f"Nieznane ramkowanie w nagraniu: {code}")
+    records: List[Tuple[int, float, bytes, bool]] = []
+    offset = _HEADER.size
+    while offset < len(data):
+        if offset + _RECORD.size > len(data):
+            raise ValueError("Ucięty rekord nagrania")
+        direction, t, length = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        frame = data[offset:offset + length]
+        if len(frame) != length:
+            raise ValueError("Ucięta ramka nagrania")
+        offset += length
+        records.append((direction & ~FLAG_INVALID, t, frame, bool(direction & FLAG_INVALID)))
+    return framings[code], records
+
+
+def _split_frame(framing: str, frame: bytes) -> Tuple[int, int, bytes]:
+    """(tid, unit, PDU) z surowej ramki; RTU nie ma identyfikatora transakcji (tid=0)."""
+    if framing == FRAMING_RTU_OVER_TCP:
+        return 0, frame[0], frame[1:-2]
+    tid, _, _, unit = struct.unpack_from(">HHHB", frame)
+    return tid, unit, frame[7:]
+
+
+class ReplayClient(ModbusTcpClient):
+    """Transport odtwarzający nagranie zamiast rozmowy z bramką.
+
+    Zapytania są dopasowywane po (unit, PDU) do nagranych odpowiedzi, odtwarzanych po kolei
+    (w kółko po wyczerpaniu). `speed=1` odtwarza zmierzone opóźnienia odpowiedzi, większa
+    wartość je skraca, a `speed=0` odpowiada bez opóźnień. Zapytanie, na które w nagraniu
+    nie było odpowiedzi, kończy się timeoutem, a odpowiedź odrzucona przy parsowaniu -
+    błędem transportu, jak w kliencie sieciowym (dotyczy wszystkich zapytań w locie). Walidacja odpowiedzi i statystyki są takie
+    same jak w kliencie sieciowym, więc koordynator przechodzi tę samą ścieżkę dekodowania.
+    """
+
+    def __init__(self, data: bytes, speed: float = 1.0, timeout: float = 3.0) -> None:
+        framing, records = parse_capture(data)
+        super().__init__("replay", 0, timeout=timeout, framing=framing)
+        self._speed = speed
+        # (unit, PDU zapytania) -> kolejka (PDU odpowiedzi, None przy timeoucie albo b"" przy
+        # odpowiedzi odrzuconej, opóźnienie [s]).
+        self._responses: Dict[Tuple[int, bytes], Deque[Tuple[bytes | None, float]]] = {}
+        waiting: Dict[int, List[Tuple[Tuple[int, bytes], float]]] = {}
+        for direction, t, frame, invalid in records:
+            if invalid:
+                # Klient zrywa połączenie - wszystkie zapytania w locie kończą się błędem.
+                for pending in waiting.values():
+                    for key, sent in pending:
+                        self._responses.setdefault(key, deque()).append((b"", t - sent))
+                waiting.clear()
+                continue
+            tid, unit, pdu = _split_frame(framing, frame)
+            if direction == DIRECTION_REQUEST:
+                waiting.setdefault(tid, []).append(((unit, pdu), t))
+                continue
+            pending = waiting.get(tid)
+            if not pending:
+                continue
+            # Odpowiedź należy do najnowszego zapytania o tym tid (w RTU: ostatniego wysłanego).
+            key, sent = pending.pop()
+            for lost_key, _ in pending:
+                self._responses.setdefault(lost_key, deque()).append((None, 0.0))
+            pending.clear()
+            self._responses.setdefault(key, deque()).append((pdu, t - sent))
+        for pending in waiting.values():
+            for key, _ in pending:
+                self._responses.setdefault(key, deque()).append((None, 0.0))
+
+    @property
+    def requests_recorded(self) -> int:
+        return sum(len(q) for q in self._responses.values())
+
+    @property
+    def state(self) -> str:
+        return "replay"
+
+    async def connect(self) -> None:
+        return
+
+    async def close(self) -> None:
+        return
+
+    async def _send_pdu(self, pdu: bytes, unit: int | None = None, timeout: float | None = None) -> bytes:
+        unit_id = self._unit if unit is None else unit
+        stats = self.stats
+        stats.requests += 1
+        queue = self._responses.get((unit_id, bytes(pdu)))
+        if not queue:
+            stats.device_errors += 1
+            raise ModbusError(f"Zapytanie (unit={unit_id}, pdu={bytes(pdu).hex()}) nie występuje w nagraniu")
+        data, latency = queue[0]
+        queue.rotate(-1)
+        if data is None:
+            stats.timeouts += 1
+            if self._speed:
+                await asyncio.sleep((timeout if timeout is not None else self._timeout) / self._speed)
+            raise asyncio.TimeoutError
+        if self._speed:
+            await asyncio.sleep(latency / self._speed)
+        if not data:
+            stats.transport_errors += 1
+            raise ModbusConnectionError("Nagrana odpowiedź odrzucona przy parsowaniu")
+        stats.rtt.add(latency * 1000)
+        stats.bytes_received += len(data)
+        if data[0] & 0x80:
+            stats.device_errors += 1
+            code = data[1] if len(data) > 1 else 0
+            raise ModbusError(f"Exception from device (function={data[0]&0x7F}, code={code})")
+        return data
@@ -1,39 +1,188 @@
 
 from __future__ import annotations
-from typing import Any, Dict
+import logging
+from typing import Any, Dict, List, Set
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.const import CONF_HOST, CONF_PORT
+from homeassistant.helpers import config_validation as cv
 
 from .const import (
     DOMAIN,
     CONF_UNIT_ID,
+    CONF_UNIT_IDS,
     CONF_SCAN_INTERVAL,
+    CONF_MAX_GAP,
+    CONF_MAX_IN_FLIGHT,
+    CONF_FRAMING,
+    CONF_PROFILE,
+    CONF_ADAPTIVE,
+    CONF_DERIVED,
+    CONF_WINDOW,
     DEFAULT_HOST,
     DEFAULT_PORT,
     DEFAULT_UNIT_ID,
     DEFAULT_SCAN_INTERVAL,
+    DEFAULT_MAX_GAP,
+    DEFAULT_MAX_IN_FLIGHT,
+    MAX_IN_FLIGHT_LIMIT,
+    DEFAULT_FRAMING,
+    DEFAULT_PROFILE,
+    DEFAULT_ADAPTIVE,
+    DEFAULT_DERIVED,
+    DEFAULT_WINDOW,
+    WINDOW_CHOICES,
+    PROFILES,
+    DISCOVERY_DEFAULT_RANGE,
+    parse_unit_ids,
 )
+from .discovery import DiscoveredUnit, async_scan_units
+from .gateway import async_get_gateway, async_release_gateway
+from .modbus_client import FRAMINGS
+from .read_plan import MAX_READ_COUNT
+
+_LOGGER = logging.getLogger(__name__)
+
+CONF_DISCOVER = "discover"
+CONF_SCAN_RANGE = "scan_range"
+CONF_UNITS = "units"
 
 class OrnoConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
-    VERSION = 1
+    VERSION = 2
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Any] = {}
+        self._found: List[DiscoveredUnit] = []
+
+    async def _async_test_connection(self, host: str, port: int) -> bool:
+        """Asynchroniczny test połączenia TCP przez współdzieloną bramkę."""
+        gateway = async_get_gateway(self.hass, host, port)
+        try:
+            await gateway.client.connect()
+        except Exception as err:
+            _LOGGER.debug("ORNO: test połączenia %s:%s nieudany: %s", host, port, err)
+            return False
+        finally:
+            await async_release_gateway(self.hass, gateway)
+        return True
+
+    def _configured_units(self, host: str, port: int) -> Set[int]:
+        """Jednostki obsługiwane przez istniejące wpisy tej samej bramki."""
+        taken: Set[int] = set()
+        for entry in self._async_current_entries():
+            if entry.data.get(CONF_HOST) == host and entry.data.get(CONF_PORT) == port:
+                taken.update(
+                    entry.data.get(CONF_UNIT_IDS) or [entry.data.get(CONF_UNIT_ID, DEFAULT_UNIT_ID)]
+                )
+        return taken
+
+    async def _async_create(self, data: Dict[str, Any], units: List[int]):
+        if len(units) > 1:
+            # Wiele liczników na jednej magistrali - jeden wpis i jeden przegląd wszystkich jednostek.
+            data[CONF_UNIT_IDS] = units
+        data[CONF_UNIT_ID] = units[0]
+        # unique_id obejmuje całą listę jednostek, więc nakładające się listy na tej samej
+        # bramce trzeba wykryć osobno - dwa wpisy odpytujące ten sam licznik dublują encje.
+        taken = self._configured_units(data[CONF_HOST], data[CONF_PORT])
+        if taken.intersection(units):
+            return self.async_abort(reason="unit_already_configured")
+        await self.async_set_unique_id(
+            f"{data[CONF_HOST]}:{data[CONF_PORT]}:{','.join(map(str, units))}"
+        )
+        self._abort_if_unique_id_configured()
+        model = PROFILES.get(data.get(CONF_PROFILE, DEFAULT_PROFILE), "ORNO")
+        return self.async_create_entry(title=f"{model} {data[CONF_HOST]}", data=data)
 
     async def async_step_user(self, user_input: Dict[str, Any] | None = None):
         errors: Dict[str, str] = {}
         if user_input is not None:
-            await self.async_set_unique_id(
-                f"{user_input[CONF_HOST]}:{user_input[CONF_PORT]}:{user_input[CONF_UNIT_ID]}"
-            )
-            self._abort_if_unique_id_configured()
-            return self.async_create_entry(
-                title=f"ORNO 517 {user_input[CONF_HOST]}",
-                data=user_input
-            )
+            data = dict(user_input)
+            units = [data[CONF_UNIT_ID]]
+            raw_units = (data.pop(CONF_UNIT_IDS, None) or "").strip()
+            if data.pop(CONF_DISCOVER, False):
+                self._data = data
+                return await self.async_step_discover()
+            if raw_units:
+                try:
+                    units = parse_unit_ids(raw_units)
+                except ValueError:
+                    errors[CONF_UNIT_IDS] = "invalid_unit_ids"
+            if not errors:
+                if await self._async_test_connection(data[CONF_HOST], data[CONF_PORT]):
+                    return await self._async_create(data, units)
+                errors["base"] = "cannot_connect"
 
         data_schema = vol.Schema({
             vol.Required(CONF_HOST, default=DEFAULT_HOST): str,
             vol.Required(CONF_PORT, default=DEFAULT_PORT): int,
             vol.Required(CONF_UNIT_ID, default=DEFAULT_UNIT_ID): int,
+            vol.Optional(CONF_UNIT_IDS): str,
+            vol.Optional(CONF_PROFILE, default=DEFAULT_PROFILE): vol.In(PROFILES),
+            vol.Optional(CONF_FRAMING, default=DEFAULT_FRAMING): vol.In(FRAMINGS),
             vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): vol.All(int, vol.Range(min=5)),
+            vol.Optional(CONF_MAX_GAP, default=DEFAULT_MAX_GAP): vol.All(int, vol.Range(min=0, max=MAX_READ_COUNT - 1)),
+            vol.Optional(CONF_MAX_IN_FLIGHT, default=DEFAULT_MAX_IN_FLIGHT): vol.All(int, vol.Range(min=1, max=MAX_IN_FLIGHT_LIMIT)),
+            vol.Optional(CONF_ADAPTIVE, default=DEFAULT_ADAPTIVE): bool,
+            vol.Optional(CONF_DERIVED, default=DEFAULT_DERIVED): bool,
+            vol.Optional(CONF_WINDOW, default=DEFAULT_WINDOW): vol.In(WINDOW_CHOICES),
+            vol.Optional(CONF_DISCOVER, default=False): bool,
         })
         return self.async_show_form(step_id="user", data_schema=data_schema, errors=errors)
+
+    async def async_step_discover(self, user_input: Dict[str, Any] | None = None):
+        """Wyszukiwanie jednostek odpowiadających na bramce w podanym zakresie."""
+        errors: Dict[str, str] = {}
+        if user_input is not None:
+            try:
+                units = parse_unit_ids(user_input[CONF_SCAN_RANGE])
+            except ValueError:
+                errors[CONF_SCAN_RANGE] = "invalid_unit_ids"
+            else:
+                data = self._data
+                gateway = async_get_gateway(
+                    self.hass, data[CONF_HOST], data[CONF_PORT],
+                    max_in_flight=data.get(CONF_MAX_IN_FLIGHT, DEFAULT_MAX_IN_FLIGHT),
+                    framing=data.get(CONF_FRAMING, DEFAULT_FRAMING),
+                )
+                try:
+                    self._found = await async_scan_units(gateway, units)
+                except Exception as err:
+                    _LOGGER.debug("ORNO: wyszukiwanie jednostek nieudane: %s", err)
+                    errors["base"] = "cannot_connect"
+                finally:
+                    await async_release_gateway(self.hass, gateway)
+                if not errors:
+                    if self._found:
+                        return await self.async_step_select()
+                    errors["base"] = "no_units_found"
+
+        return self.async_show_form(
+            step_id="discover",
+            data_schema=vol.Schema({
+                vol.Required(CONF_SCAN_RANGE, default=DISCOVERY_DEFAULT_RANGE): str,
+            }),
+            errors=errors,
+        )
+
+    async def async_step_select(self, user_input: Dict[str, Any] | None = None):
+        """Wybór liczników spośród znalezionych jednostek."""
+        errors: Dict[str, str] = {}
+        if user_input is not None:
+            units = sorted(int(u) for u in user_input[CONF_UNITS])
+            if units:
+                return await self._async_create(dict(self._data), units)
+            errors["base"] = "no_units_selected"
+
+        options = {
+            str(u.unit_id): (
+                f"Unit {u.unit_id}" if u.meter_id is None else f"Unit {u.unit_id} (ID {u.meter_id})"
+            )
+            for u in self._found
+        }
+        return self.async_show_form(
+            step_id="select",
+            data_schema=vol.Schema({
+                vol.Required(CONF_UNITS, default=list(options)): cv.multi_select(options),
+            }),
+            errors=errors,
+        )
@@ -1,49 +1,139 @@
 
 from __future__ import annotations
 from datetime import timedelta
-from homeassistant.components.sensor import SensorDeviceClass
+from typing import List, Set
 
 DOMAIN = "orno_517"
 
 CONF_UNIT_ID = "unit_id"
+# Lista jednostek odpytywanych przez jeden wpis (np. "1-16" lub "1,2,5" w formularzu).
+CONF_UNIT_IDS = "unit_ids"
 CONF_SCAN_INTERVAL = "scan_interval"
+CONF_MAX_GAP = "max_gap"
+CONF_MAX_IN_FLIGHT = "max_in_flight"
+CONF_FRAMING = "framing"
+CONF_PROFILE = "profile"
+CONF_ADAPTIVE = "adaptive"
+CONF_DERIVED = "derived"
+CONF_WINDOW = "window"
+# Klucze wpisów starej integracji (przed przejściem na własnego klienta asyncio).
+CONF_LEGACY_SLAVE = "slave"
+CONF_LEGACY_DEVICE_NAME = "device_name"
+# Adresy encji starej integracji, których znaczenie i jednostka się nie zmieniły (napięcia,
+# częstotliwość, prądy, współczynniki mocy) - tylko one przejmują nowe unique_id z historią.
+# Moce były w W/var/VA, a adres 36 był energią bierną (kvarh) - dziś to kW/kvar/kVA i moc
+# bierna. Adres 2 ("Meter ID") nie ma odpowiednika w profilu.
+LEGACY_MIGRATED_ADDRESSES = frozenset(range(14, 28, 2)) | frozenset(range(52, 60, 2))
+LEGACY_REMOVED_ADDRESSES = frozenset({2})
 
 DEFAULT_HOST = "192.168.86.202"
 DEFAULT_PORT = 4196
 DEFAULT_UNIT_ID = 2
+MIN_UNIT_ID = 1
+MAX_UNIT_ID = 247
+# Jednostka, która przestała odpowiadać, jest w przeglądzie magistrali pomijana przez tyle sekund,
+# żeby jej timeouty nie opóźniały odczytu pozostałych liczników.
+UNIT_OFFLINE_RETRY_S = 60
+# Wyszukiwanie jednostek: rejestr identyfikatora licznika (holding) i limit czasu pojedynczej sondy [s].
+DISCOVERY_REGISTER = 2
+DISCOVERY_PROBE_TIMEOUT = 0.5
+DISCOVERY_DEFAULT_RANGE = f"{MIN_UNIT_ID}-{MAX_UNIT_ID}"
 DEFAULT_SCAN_INTERVAL = 15
+# Maksymalna liczba nieużywanych rejestrów, które mogą zostać dołączone do odczytu blokowego.
+DEFAULT_MAX_GAP = 8
+# Liczba transakcji Modbus TCP wysyłanych jednocześnie (1 = bez pipeliningu).
+DEFAULT_MAX_IN_FLIGHT = 1
+MAX_IN_FLIGHT_LIMIT = 16
+# Ramkowanie: "tcp" (MBAP) lub "rtu_over_tcp" (surowe ramki RTU przez przezroczystą bramkę).
+DEFAULT_FRAMING = "tcp"
+# Profile urządzeń (mapy rejestrów) w katalogu profiles/: klucz -> model.
+PROFILES = {
+    "or_we_517": "OR-WE-517",
+    "or_we_516": "OR-WE-516",
+    "or_we_514": "OR-WE-514",
+}
+DEFAULT_PROFILE = "or_we_517"
+# Co ile sekund nauczone typy rejestrów (input/holding) są sprawdzane ponownie.
+REGISTER_CACHE_REPROBE_S = 7 * 24 * 3600
+# Migawka wartości jest zapisywana najwyżej raz na tyle sekund (i przy zatrzymaniu HA).
+SNAPSHOT_SAVE_INTERVAL_S = 60
+
+# Termin cyklu odczytu jako ułamek najdłuższego okresu należnych klas, nie krótszy niż limit
+# czasu zapytania klienta [s]: bloki bez odpowiedzi po terminie nie wstrzymują cyklu i są
+# publikowane, gdy odpowiedź dotrze. Nieaktualne (`stale`) są tylko bloki zakończone błędem.
+POLL_DEADLINE_FACTOR = 0.8
+POLL_MIN_DEADLINE_S = 3.0
+# Okresy odpytywania dla klas "szybkiej" i "wolnej" (pole "interval" w profilach: "fast"/"slow").
+FAST_SCAN_INTERVAL = 1
+SLOW_SCAN_INTERVAL = 30
+# Tryb adaptacyjny (domyślnie wyłączony): zmiana wartości o więcej niż tyle % (lub poza martwą
+# strefą / krokiem precyzji) skraca okres klasy, stabilne odczyty go wydłużają.
+DEFAULT_ADAPTIVE = False
+ADAPTIVE_TOLERANCE_PCT = 2.0
+# Wartości pochodne (sekcja "derived" profilu) liczone lokalnie zamiast odczytu rejestrów.
+DEFAULT_DERIVED = False
+# Tryb okienkowy: próbki z każdego cyklu trafiają do agregatów okna [s] (0 = wyłączony), a encje
+# dostają tylko średnią (liczniki: ostatnią wartość) z min/max po jego zamknięciu. Okna są
+# wyrównane do zegara, więc ich długość musi dzielić godzinę statystyk długoterminowych.
+DEFAULT_WINDOW = 0
+WINDOW_CHOICES = [0, 60, 300, 600, 900]
 
 PLATFORMS = ["sensor"]
+
+SERVICE_RESET_REGISTER_CACHE = "reset_register_cache"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+SERVICE_BURST_SAMPLE = "burst_sample"
+EVENT_BURST = f"{DOMAIN}_burst"
+ATTR_UNIT_ID = "unit_id"
+ATTR_REGISTERS = "registers"
+ATTR_DURATION = "duration"
+# Próbkowanie seryjne: domyślne rejestry, czas [s] i szacowana częstość do prealokacji bufora [Hz].
+BURST_DEFAULT_REGISTERS = ["Moc czynna", "Prąd", "Prąd L1", "Prąd L2", "Prąd L3"]
+BURST_DEFAULT_DURATION_S = 10
+BURST_MAX_DURATION_S = 60
+BURST_CAPACITY_HZ = 50
+SERVICE_START_CAPTURE = "start_capture"
+SERVICE_SAVE_CAPTURE = "save_capture"
+ATTR_MAX_SIZE = "max_size"
+ATTR_STOP = "stop"
+# Nagrywanie ramek: limit bufora pierścieniowego [KiB].
+CAPTURE_DEFAULT_SIZE_KB = 1024
+CAPTURE_MAX_SIZE_KB = 64 * 1024
+SERVICE_READ_REGISTERS = "read_registers"
+ATTR_INPUT_TYPE = "input_type"
+ATTR_ADDRESS = "address"
+ATTR_COUNT = "count"
+ATTR_DTYPE = "dtype"
+ATTR_WORD_SWAP = "word_swap"
+ATTR_MAX_AGE = "max_age"
+# Odczyt dowolnego zakresu: limit rejestrów w jednym wywołaniu i czas pamiętania wyniku [s].
+READ_REGISTERS_MAX_COUNT = 2000
+READ_REGISTERS_TTL_S = 5.0
+# Subskrypcja surowych próbek (websocket): odstęp wysyłki paczek [s] i limit ramek czekających
+# na wysyłkę - po jego przekroczeniu najstarsze ramki są odrzucane.
+WS_SUBSCRIBE_SAMPLES = f"{DOMAIN}/subscribe_samples"
+ATTR_BATCH_INTERVAL = "batch_interval"
+ATTR_MAX_FRAMES = "max_frames"
+SAMPLES_DEFAULT_INTERVAL_S = 1.0
+SAMPLES_MAX_INTERVAL_S = 60.0
+SAMPLES_DEFAULT_MAX_FRAMES = 120
+SAMPLES_MAX_FRAMES = 3600
 UPDATE_INTERVAL = timedelta(seconds=DEFAULT_SCAN_INTERVAL)
 
-SENSOR_DEFS = [
-    {"name": "Napięcie L1", "address": 14, "unit": "V", "device_class": SensorDeviceClass.VOLTAGE, "input_type": "input", "dtype": "float32", "precision": 1},
-    {"name": "Napięcie L2", "address": 16, "unit": "V", "device_class": SensorDeviceClass.VOLTAGE, "input_type": "input", "dtype": "float32", "precision": 1},
-    {"name": "Napięcie L3", "address": 18, "unit": "V", "device_class": SensorDeviceClass.VOLTAGE, "input_type": "input", "dtype": "float32", "precision": 1},
-
-    {"name": "Częstotliwość", "address": 20, "unit": "Hz", "device_class": SensorDeviceClass.FREQUENCY, "input_type": "input", "dtype": "float32", "precision": 1},
-
-    {"name": "Prąd L1", "address": 22, "unit": "A", "device_class": SensorDeviceClass.CURRENT, "input_type": "input", "dtype": "float32", "precision": 1},
-    {"name": "Prąd L2", "address": 24, "unit": "A", "device_class": SensorDeviceClass.CURRENT, "input_type": "input", "dtype": "float32", "precision": 1},
-    {"name": "Prąd L3", "address": 26, "unit": "A", "device_class": SensorDeviceClass.CURRENT, "input_type": "input", "dtype": "float32", "precision": 1},
-
-    {"name": "Moc czynna", "address": 28, "unit": "kW", "device_class": SensorDeviceClass.POWER, "input_type": "input", "dtype": "float32", "precision": 1},
-    {"name": "Moc czynna L1", "address": 30, "unit": "kW", "device_class": SensorDeviceClass.POWER, "input_type": "input", "dtype": "float32", "precision": 1},
-    {"name": "Moc czynna L2", "address": 32, "unit": "kW", "device_class": SensorDeviceClass.POWER, "input_type": "input", "dtype": "float32", "precision": 1},
-    {"name": "Moc czynna L3", "address": 34, "unit": "kW", "device_class": SensorDeviceClass.POWER, "input_type": "input", "dtype": "float32", "precision": 1},
-
-    {"name": "Moc bierna", "address": 36, "unit": "kvar", "device_class": None, "input_type": "input", "dtype": "float32", "precision": 1},
-    {"name": "Moc bierna L1", "address": 38, "unit": "kvar", "device_class": None, "input_type": "input", "dtype": "float32", "precision": 1},
-    {"name": "Moc bierna L2", "address": 40, "unit": "kvar", "device_class": None, "input_type": "input", "dtype": "float32", "precision": 1},
-    {"name": "Moc bierna L3", "address": 42, "unit": "kvar", "device_class": None, "input_type": "input", "dtype": "float32", "precision": 1},
-
-    {"name": "Moc pozorna", "address": 44, "unit": "kVA", "device_class": None, "input_type": "input", "dtype": "float32", "precision": 1},
-    {"name": "Moc pozorna L1", "address": 46, "unit": "kVA", "device_class": None, "input_type": "input", "dtype": "float32", "precision": 1},
-    {"name": "Moc pozorna L2", "address": 48, "unit": "kVA", "device_class": None, "input_type": "input", "dtype": "float32", "precision": 1},
-    {"name": "Moc pozorna L3", "address": 50, "unit": "kVA", "device_class": None, "input_type": "input", "dtype": "float32", "precision": 1},
-
-    {"name": "Współczynnik mocy", "address": 52, "unit": "", "device_class": None, "input_type": "input", "dtype": "float32", "precision": 2},
-    {"name": "Współczynnik mocy L1", "address": 54, "unit": "", "device_class": None, "input_type": "input", "dtype": "float32", "precision": 2},
-    {"name": "Współczynnik mocy L2", "address": 56, "unit": "", "device_class": None, "input_type": "input", "dtype": "float32", "precision": 2},
-    {"name": "Współczynnik mocy L3", "address": 58, "unit": "", "device_class": None, "input_type": "input", "dtype": "float32", "precision": 2},
-]
+
+def parse_unit_ids(value: str) -> List[int]:
+    """Zamienia zapis "1-4,7" na posortowaną listę jednostek; ValueError przy błędnym zapisie."""
+    units: Set[int] = set()
+    for part in value.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = (int(x) for x in part.split("-", 1))
+            if lo > hi:
+                raise ValueError(part)
+            units.update(range(lo, hi + 1))
+        else:
+            units.add(int(part))
+    if not units or min(units) < MIN_UNIT_ID or max(units) > MAX_UNIT_ID:
+        raise ValueError(value)
+    return sorted(units)
@@ -1,108 +1,856 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-import struct
+import time
+from array import array
+from dataclasses import dataclass, field
 from datetime import timedelta
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, FrozenSet, List, Set, Tuple
 
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
-from .const import SENSOR_DEFS, UPDATE_INTERVAL
+from .adaptive import AdaptiveSchedule, change_tolerance
+from .burst import BurstBuffer
+from .decoder import BlockDecoder
+from .derived import DerivedCalculator, DerivedField
+from .const import (
+    UPDATE_INTERVAL,
+    DEFAULT_MAX_GAP,
+    UNIT_OFFLINE_RETRY_S,
+    BURST_CAPACITY_HZ,
+    ADAPTIVE_TOLERANCE_PCT,
+    POLL_DEADLINE_FACTOR,
+    POLL_MIN_DEADLINE_S,
+    SNAPSHOT_SAVE_INTERVAL_S,
+)
+from .modbus_client import (
+    FC_READ_HOLDING_REGISTERS,
+    FC_READ_INPUT_REGISTERS,
+    ModbusError,
+    ModbusConnectionError,
+)
+from .gateway import PRIORITY_LOW
+from .profiles import DeviceProfile
+from .read_plan import ReadBlock, ReadField
+from .snapshot import UnitSnapshot, ValueDescriptor
+from .stats import PollStats
+from .storage import RegisterTypeCache, ValueSnapshot
+from .window import HOUR_S, WindowStats, add_hour_statistics
 
 _LOGGER = logging.getLogger(__name__)
 
-class OrnoCoordinator(DataUpdateCoordinator[Dict[str, Any]]):
-    """Koordynator odczytów Modbus dla ORNO 517."""
-
-    def __init__(self, hass: HomeAssistant, client, scan_interval_s: int | None = None) -> None:
-        interval = timedelta(seconds=scan_interval_s) if scan_interval_s else UPDATE_INTERVAL
-        super().__init__(hass, _LOGGER, name="ORNO Coordinator", update_interval=interval)
-        self.client = client
-        self._defs: List[Dict[str, Any]] = list(SENSOR_DEFS)
-
-    async def _async_update_data(self) -> Dict[str, Any]:
-        results: Dict[str, Any] = {}
-        errors: List[Tuple[int, str]] = []
-
-        for d in self._defs:
-            addr: int = d["address"]
-            dtype: str = d.get("dtype") or d.get("data_type", "uint16")
-            name: str = d["name"]
-            unit_type: str = d.get("input_type", "holding")  # holding | input
-            scale: float = float(d.get("scale", 1.0))
-            precision = d.get("precision")
-            word_swap: bool = bool(d.get("word_swap", False))
-            fallback: bool = bool(d.get("fallback", True))
-
-            count = 1 if dtype in ("uint16", "int16") else 2
-
-            async def _read(kind: str) -> List[int]:
-                if kind == "holding":
-                    return await self.client.read_holding_registers(addr, count)
-                return await self.client.read_input_registers(addr, count)
-
-            regs: List[int] | None = None
-            try:
-                regs = await _read(unit_type)
-            except Exception as e1:
-                if fallback:
-                    try:
-                        other = "input" if unit_type == "holding" else "holding"
-                        regs = await _read(other)
-                        _LOGGER.debug("ORNO: %s: fallback %s->%s OK", name, unit_type, other)
-                    except Exception as e2:
-                        errors.append((addr, f"{e1} / {e2}"))
-                else:
-                    errors.append((addr, str(e1)))
 
-            if not regs:
+@dataclass
+class _UnitState:
+    """Stan jednego licznika w przeglądzie magistrali."""
+
+    unit_id: int
+    client: Any
+    online: bool = True
+    retry_at: float = 0.0
+    # restored=True, dopóki wartości pochodzą z migawki sprzed restartu.
+    restored: bool = False
+    # Czas monotoniczny ostatniej publikacji wartości, indeksowany slotem (heartbeat).
+    published_at: array = field(default_factory=lambda: array("d"))
+    # 1 dla slotów, których ostatni odczyt zakończył się błędem lub timeoutem (także pojedynczego pola).
+    stale: bytearray = field(default_factory=bytearray)
+    derived: DerivedCalculator | None = None
+    # Tryb okienkowy: bieżące próbki (niepublikowane), agregaty otwartego okna,
+    # ostatnie zamknięte okno (atrybuty encji) i bieżąca godzina (statystyki długoterminowe).
+    live: UnitSnapshot | None = None
+    # Sloty `live` zapisane od ostatniej próbki - tylko one trafiają do okna jako nowa próbka
+    # (klasy częstotliwości, których nie było w cyklu, i nieudane bloki zachowują stare wartości).
+    fresh: bytearray = field(default_factory=bytearray)
+    window: WindowStats | None = None
+    closed: WindowStats | None = None
+    hour: WindowStats | None = None
+
+
+@dataclass
+class _PartialRead:
+    """Blok odczytany pole po polu po odrzuceniu całości przez urządzenie.
+
+    `regs` ma rozmiar całego bloku, ale dekoder obejmuje tylko odczytane pola - pola bez
+    odpowiedzi (sloty w `failed`) nie są publikowane i zostają oznaczone jako nieaktualne.
+    """
+
+    regs: bytearray
+    decoder: BlockDecoder
+    failed: FrozenSet[int]
+
+
+class OrnoCoordinator(DataUpdateCoordinator[Dict[int, UnitSnapshot]]):
+    """Koordynator odczytów Modbus dla ORNO 517.
+
+    Jeden koordynator obsługuje wszystkie jednostki wpisu (`clients`: unit_id -> klient).
+    W każdym cyklu bloki należnych klas są wysyłane dla wszystkich jednostek naraz; kolejka
+    bramki przeplata je między licznikami i pipelinuje, o ile pozwala na to transport.
+    Dane mają postać {unit_id: UnitSnapshot}: wartości w tablicy indeksowanej slotami
+    z profilu (`ValueDescriptor.slot`) z bitmapą ważności i czasem odczytu.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        clients: Dict[int, Any],
+        profile: DeviceProfile,
+        scan_interval_s: int | None = None,
+        max_gap: int = DEFAULT_MAX_GAP,
+        register_cache: RegisterTypeCache | None = None,
+        snapshot: ValueSnapshot | None = None,
+        adaptive: bool = False,
+        derived: bool = False,
+        window_s: int = 0,
+        statistic_prefix: str | None = None,
+    ) -> None:
+        base = float(scan_interval_s) if scan_interval_s else UPDATE_INTERVAL.total_seconds()
+        self.units: Dict[int, _UnitState] = {
+            unit_id: _UnitState(unit_id, client) for unit_id, client in sorted(clients.items())
+        }
+        # Przy jednym liczniku klucze pamięci typów rejestrów pozostają bez numeru jednostki.
+        self._multi = len(self.units) > 1
+        self.register_cache = register_cache
+        self._snapshot = snapshot
+        # Czas monotoniczny, od którego wolno zaplanować kolejny zapis migawki.
+        self._snapshot_save_at = 0.0
+        self.profile = profile
+        # Wartości pochodne: rejestry, które da się policzyć z innych, nie są odczytywane
+        # (encja zostaje), a nowe wartości dostają własne encje.
+        self._derived: List[Dict[str, Any]] = list(profile.derived) if derived else []
+        replaced = {d["name"] for d in self._derived if "address" in d}
+        self._polled: List[Dict[str, Any]] = [d for d in profile.defs if d["name"] not in replaced]
+        extra = {d["name"] for d in self._derived if "key" in d}
+        # Wartości wystawiane jako encje; nowe wartości pochodne tylko w trybie "derived".
+        self.descriptors: Tuple[ValueDescriptor, ...] = tuple(
+            desc for desc in profile.descriptors if desc.key is None or desc.name in extra
+        )
+        self._size = len(profile.descriptors)
+        for unit in self.units.values():
+            unit.published_at = array("d", bytes(8 * self._size))
+            unit.stale = bytearray(self._size)
+            if self._derived:
+                unit.derived = DerivedCalculator(self._derived, profile.slots)
+
+        # Klasy częstotliwości: każda definicja może mieć własny "interval" (s),
+        # pozostałe są odpytywane co scan_interval. Plan blokowy budowany jest dla zbioru
+        # klas należnych w danym cyklu, więc gdy wszystkie przypadają naraz, wystarcza jeden odczyt.
+        self._max_gap = max_gap
+        self._rates: Dict[float, List[Dict[str, Any]]] = {}
+        for d in self._polled:
+            self._rates.setdefault(float(d.get("interval") or base), []).append(d)
+        self._plans: Dict[FrozenSet[float], List[ReadBlock]] = {}
+        self._next_due: Dict[float, float] = {rate: 0.0 for rate in self._rates}
+        # (unit_id, slot) sensorów, których opublikowana wartość zmieniła się w ostatnim cyklu.
+        self.updated_keys: Set[Tuple[int, int]] = set()
+        self.stats = PollStats()
+        self._decode_s = 0.0
+        self.burst_active = False
+
+        # Tryb adaptacyjny: okresy klas zależą od zmienności wartości i obciążenia bramki.
+        self.adaptive: AdaptiveSchedule | None = None
+        self._rate_of: Dict[int, float] = {}
+        self._tolerance: Dict[int, Tuple[float, float]] = {}
+        self._volatile: Set[float] = set()
+        self._due_rates: List[float] = []
+        if adaptive:
+            self.adaptive = AdaptiveSchedule(self._rates)
+            for rate, rate_defs in self._rates.items():
+                for d in rate_defs:
+                    tolerance = change_tolerance(d, ADAPTIVE_TOLERANCE_PCT)
+                    if tolerance is not None:
+                        self._rate_of[d["slot"]] = rate
+                        self._tolerance[d["slot"]] = tolerance
+
+        # Tryb okienkowy: każdy cykl to próbka w agregatach okna; encje dostają średnią
+        # (liczniki i wartości bez state_class "measurement": ostatnią wartość) raz na okno.
+        self.window_s = int(window_s or 0)
+        self._statistic_prefix = statistic_prefix
+        self._window_mean: List[ValueDescriptor] = []
+        self._window_last: List[ValueDescriptor] = []
+        if self.window_s:
+            for desc in self.descriptors:
+                (self._window_mean if desc.state_class == "measurement" else self._window_last).append(desc)
+            for unit in self.units.values():
+                unit.live = UnitSnapshot(self._size)
+                unit.fresh = bytearray(self._size)
+
+        # Subskrypcje surowych próbek (websocket): wartości prosto z dekodera, bez martwej strefy,
+        # okien i maszyny stanów. Migawki próbek cyklu powstają tylko, gdy ktoś słucha.
+        self._sample_listeners: List[Callable[[float, Dict[int, UnitSnapshot]], None]] = []
+        self._samples: Dict[int, UnitSnapshot] | None = None
+        # Publikacja blokami: encje wartości (unit_id, slot) i bloki czekające po terminie cyklu.
+        self._key_listeners: Dict[Tuple[int, int], Callable[[], None]] = {}
+        self._inflight: Dict[Tuple[int, str, int, int], asyncio.Task] = {}
+        # (wyniki, jednostki skopiowane) trwającego cyklu - dla bloków spóźnionych.
+        self._cycle: Tuple[Dict[int, UnitSnapshot], Set[int]] | None = None
+
+        tick = min(self._rates)
+        super().__init__(hass, _LOGGER, name="ORNO Coordinator", update_interval=timedelta(seconds=tick))
+
+    @property
+    def derived(self) -> List[Dict[str, Any]]:
+        return self._derived
+
+    def restore(self, snapshot: Dict[int, Dict[str, Any]]) -> None:
+        """Ustawia wartości z migawki jako dane startowe, zanim odbędzie się pierwszy odczyt."""
+        slots = {desc.name: desc.slot for desc in self.descriptors}
+        data: Dict[int, UnitSnapshot] = {}
+        for unit_id, unit in self.units.items():
+            saved = snapshot.get(unit_id)
+            if not saved:
                 continue
+            snap = UnitSnapshot(self._size)
+            for name, value in saved["values"].items():
+                if name in slots and isinstance(value, (int, float)):
+                    snap.set(slots[name], value)
+            if snap.count():
+                snap.read_at = saved["read_at"]
+                data[unit_id] = snap
+                unit.restored = True
+        if data:
+            self.data = data
+            _LOGGER.debug("ORNO: przywrócono migawkę dla jednostek %s", sorted(data))
+
+    def values(self, unit_id: int) -> Dict[str, Any]:
+        """Bieżące wartości jednostki jako {nazwa: wartość} (diagnostyka, migawka na dysku)."""
+        snap = (self.data or {}).get(unit_id)
+        return snap.as_dict(self.descriptors) if snap is not None else {}
+
+    def window_attributes(self, unit_id: int, slot: int) -> Dict[str, Any] | None:
+        """Min/max/ostatnia wartość i liczba próbek ostatniego zamkniętego okna."""
+        closed = self.units[unit_id].closed
+        return closed.summary(slot) if closed is not None else None
+
+    def async_add_sample_listener(
+        self, listener: Callable[[float, Dict[int, UnitSnapshot]], None]
+    ) -> Callable[[], None]:
+        """Rejestruje odbiorcę próbek: po każdym cyklu dostaje (czas unix, {unit_id: próbki cyklu})."""
+        self._sample_listeners.append(listener)
 
+        def remove() -> None:
+            if listener in self._sample_listeners:
+                self._sample_listeners.remove(listener)
+
+        return remove
+
+    def _emit_samples(self, read_at: float) -> None:
+        samples, self._samples = self._samples, None
+        if not samples:
+            return
+        for listener in list(self._sample_listeners):
             try:
-                value = self._decode_registers(regs, dtype, word_swap)
-            except Exception as dec_err:
-                errors.append((addr, f"decode error: {dec_err}"))
+                listener(read_at, samples)
+            except Exception:
+                _LOGGER.exception("ORNO: błąd odbiorcy próbek")
+
+    def _snapshot_data(self) -> Dict[str, Any]:
+        data = self.data or {}
+        units: Dict[str, Any] = {}
+        for unit_id in self.units:
+            snap = data.get(unit_id)
+            if snap is None or snap.read_at is None:
                 continue
+            units[str(unit_id)] = {"read_at": snap.read_at, "values": self.values(unit_id)}
+        return {"units": units}
+
+    def _plan_for(self, rates: FrozenSet[float]) -> List[ReadBlock]:
+        plan = self._plans.get(rates)
+        if plan is None:
+            defs = [d for rate in sorted(rates) for d in self._rates[rate]]
+            plan = self._plans[rates] = self.profile.read_plan(defs, self._max_gap)
+            _LOGGER.debug(
+                "ORNO: plan odczytu dla klas %s s: %s",
+                sorted(rates), ", ".join(f"{b.input_type}@{b.address}+{b.count}" for b in plan),
+            )
+        return plan
+
+    def mark_all_due(self) -> None:
+        """Następny cykl odczyta wszystkie klasy częstotliwości (np. po zmianie konfiguracji)."""
+        for rate in self._next_due:
+            self._next_due[rate] = 0.0
+
+    def _due_blocks(self) -> List[ReadBlock]:
+        now = time.monotonic()
+        # Pół taktu tolerancji, żeby drobne opóźnienia timera nie przesuwały klasy o cały cykl.
+        slack = self.update_interval.total_seconds() / 2
+        adaptive = self.adaptive
+        due: List[float] = []
+        for rate in self._rates:
+            if now + slack >= self._next_due[rate]:
+                self._next_due[rate] = now + (adaptive.period(rate) if adaptive else rate)
+                due.append(rate)
+        self._due_rates = due
+        return self._plan_for(frozenset(due)) if due else []
+
+    async def _async_update_data(self) -> Dict[int, UnitSnapshot]:
+        if self.burst_active:
+            # Próbkowanie seryjne ma magistralę dla siebie; harmonogram wraca po jego zakończeniu.
+            self.updated_keys = set()
+            return self.data
+        stats = self.stats
+        started = time.perf_counter()
+        requests_before, errors_before = stats.requests, stats.request_errors
+        self._decode_s = 0.0
+        try:
+            return await self._async_poll()
+        except UpdateFailed:
+            stats.failed_polls += 1
+            raise
+        finally:
+            self._cycle = None
+            duration_ms = (time.perf_counter() - started) * 1000
+            stats.polls += 1
+            stats.last_duration_ms = round(duration_ms, 3)
+            stats.last_requests = stats.requests - requests_before
+            stats.last_errors = stats.request_errors - errors_before
+            stats.last_decode_ms = round(self._decode_s * 1000, 3)
+            stats.duration.add(duration_ms)
+            stats.decode.add(self._decode_s * 1000)
+            if self.adaptive is not None:
+                self._adapt(duration_ms, stats.last_requests, stats.last_errors)
+
+    def _adapt(self, duration_ms: float, requests: int, errors: int) -> None:
+        """Aktualizuje okresy klas po cyklu i ustawia takt koordynatora na najkrótszy z nich."""
+        adaptive = self.adaptive
+        adaptive.observe_poll(duration_ms, requests, errors)
+        # Klasę oceniamy tylko po udanym odczycie - brak danych nie znaczy, że wartości są stabilne.
+        if requests > errors:
+            for rate in self._due_rates:
+                adaptive.observe_class(rate, rate in self._volatile)
+        self._volatile.clear()
+        self._due_rates = []
+        tick = adaptive.tick()
+        if abs(tick - self.update_interval.total_seconds()) >= 0.01:
+            _LOGGER.debug("ORNO: takt adaptacyjny %.2f s (%s)", tick, adaptive.as_dict())
+            self.update_interval = timedelta(seconds=tick)
+
+    async def async_burst(
+        self, unit_id: int, defs: List[Dict[str, Any]], duration_s: float
+    ) -> Dict[str, Any]:
+        """Odczytuje wybrane rejestry jednej jednostki tak szybko, jak pozwala magistrala.
+
+        Zwykłe cykle są w tym czasie pomijane. Wynik: początek serii (unix), znaczniki czasu
+        [s od startu], surowe serie oraz min/max/średnia dla każdego rejestru.
+        """
+        unit = self.units[unit_id]
+        plan = self.profile.read_plan(defs, self._max_gap)
+        column = {d["name"]: i for i, d in enumerate(defs)}
+        buffer = BurstBuffer(list(column), duration_s * BURST_CAPACITY_HZ)
+        errors: List[Tuple[int, int, str]] = []
+        failed = 0
+        error: str | None = None
+
+        self.burst_active = True
+        started_at = time.time()
+        started = time.monotonic()
+        deadline = started + duration_s
+        try:
+            while error is None and time.monotonic() < deadline:
+                t = time.monotonic() - started
+                block_regs = await asyncio.gather(
+                    *(self._read_block(unit, b, errors) for b in plan), return_exceptions=True
+                )
+                row: Dict[int, float] = {}
+                for block, regs in zip(plan, block_regs):
+                    if isinstance(regs, ModbusConnectionError):
+                        # W backoffie kolejne próby kończyłyby się natychmiast - przerywamy serię.
+                        error = str(regs)
+                        break
+                    if regs is None or isinstance(regs, BaseException):
+                        continue
+                    try:
+                        values = self._block_values(block, regs)
+                    except Exception:
+                        continue
+                    for fld, value in values:
+                        row[column[fld.name]] = value
+                if row:
+                    buffer.append(t, row)
+                else:
+                    failed += 1
+                errors.clear()
+        finally:
+            self.burst_active = False
+
+        result = buffer.summary()
+        result.update(
+            unit_id=unit_id,
+            started_at=round(started_at, 3),
+            duration_s=round(time.monotonic() - started, 3),
+            failed_samples=failed,
+            error=error,
+        )
+        _LOGGER.debug(
+            "ORNO: seria unit %s: %s próbek (%s Hz), %s nieudanych",
+            unit_id, buffer.size, buffer.rate_hz, failed,
+        )
+        return result
+
+    def unit_available(self, unit_id: int) -> bool:
+        return self.last_update_success and self.units[unit_id].online
+
+    def _due_units(self, now: float) -> List[_UnitState]:
+        if not self._multi:
+            return list(self.units.values())
+        # Jednostki offline są pomijane do czasu ponownej próby, żeby ich timeouty
+        # nie blokowały magistrali pozostałym licznikom.
+        return [u for u in self.units.values() if u.online or now >= u.retry_at]
+
+    async def _async_poll(self) -> Dict[int, UnitSnapshot]:
+        results: Dict[int, UnitSnapshot] = dict(self.data or {})
+        updated: Set[Tuple[int, int]] = set()
+        errors: List[Tuple[int, int, str]] = []
+        plan = self._due_blocks()
+        self._samples = {} if self._sample_listeners else None
+        units = self._due_units(time.monotonic()) if plan else []
 
-            if scale != 1.0:
-                value = value * scale
-            if precision is not None and isinstance(value, (int, float)):
-                value = round(value, int(precision))
+        # Bloki wszystkich jednostek są wysyłane naraz; bramka przeplata je między licznikami,
+        # a klient ogranicza liczbę transakcji w locie. Jednostka offline dostaje tylko jeden
+        # blok próbny, żeby nie generować serii timeoutów.
+        jobs = [
+            (unit, block)
+            for unit in units
+            for block in (plan if unit.online else plan[:1])
+        ]
+        loop = asyncio.get_running_loop()
+        tasks: Dict[asyncio.Task, Tuple[_UnitState, ReadBlock]] = {}
+        for unit, block in jobs:
+            # Blok spóźniony z poprzedniego cyklu wciąż czeka na odpowiedź - nie dublujemy go.
+            if self._block_key(unit, block) not in self._inflight:
+                tasks[loop.create_task(self._read_block(unit, block, errors))] = (unit, block)
+        decoded: Dict[int, int] = {unit.unit_id: 0 for unit in units}
+        # Migawki jednostek są kopiowane przy pierwszym zapisie w cyklu, a dane koordynatora
+        # wskazują na wyniki bieżącego cyklu od jego początku - bloki są publikowane, gdy tylko
+        # dotrą, a nieudany cykl zostawia już opublikowane wartości.
+        copied: Set[int] = set()
+        self.data = results
+        self._cycle = (results, copied)
+        # W trybie okienkowym wartości trafiają do bieżących próbek jednostki, a encje
+        # widzą je dopiero po zamknięciu okna.
+        windowed = self.window_s > 0
+        sink: Set[Tuple[int, int]] = set() if windowed else updated
+        transport_error: ModbusConnectionError | None = None
+        deadline = loop.time() + self._deadline_s()
+        pending = set(tasks)
+        while pending:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                unit, block = tasks[task]
+                err = task.exception()
+                if isinstance(err, ModbusConnectionError):
+                    # Transport niedostępny (backoff / otwarty wyłącznik) - to nie wina jednostki.
+                    transport_error = err
+                    continue
+                if err is not None:
+                    errors.append((unit.unit_id, block.address, str(err) or type(err).__name__))
+                    self._mark_stale(unit, block, True, updated)
+                    continue
+                regs = task.result()
+                if regs is None:
+                    self._mark_stale(unit, block, True, updated)
+                    continue
+                if unit.unit_id not in copied:
+                    if not windowed:
+                        prev = results.get(unit.unit_id)
+                        results[unit.unit_id] = prev.copy() if prev is not None else UnitSnapshot(self._size)
+                    copied.add(unit.unit_id)
+                count = self._decode_block(
+                    unit, block, regs, unit.live if windowed else results[unit.unit_id], sink, errors
+                )
+                decoded[unit.unit_id] += count
+                if count:
+                    self._mark_read(unit, block, regs, updated)
+            if pending and not windowed and updated:
+                # Wolny blok nie wstrzymuje pozostałych: gotowe wartości trafiają do encji od razu.
+                self._publish_keys(updated)
+                updated = sink = set()
+        for task in pending:
+            # Blok wciąż w drodze po terminie cyklu nie jest oznaczany jako nieaktualny -
+            # jego odpowiedź zostanie opublikowana poza cyklem, a błąd oznaczy wartości jako stale.
+            unit, block = tasks[task]
+            key = self._block_key(unit, block)
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, u=unit, b=block, k=key: self._late_block(k, u, b, t))
+            self.stats.late_blocks += 1
+        if self._derived:
+            now = time.monotonic()
+            for unit_id in copied:
+                unit = self.units[unit_id]
+                self._publish_derived(unit, unit.live if windowed else results[unit_id], sink, now)
+        if windowed:
+            self._sample_windows(copied, results, updated)
+        decoded_total = sum(decoded.values())
+        if transport_error is not None and not decoded_total:
+            raise UpdateFailed(f"Modbus: brak połączenia: {transport_error}") from transport_error
 
-            results[name] = value
-            results[str(addr)] = value
+        failed_units = {u for u, _, _ in errors}
+        if self._multi:
+            self._update_online(units, decoded, failed_units)
 
-        if not results and errors:
+        if not decoded_total and errors:
             raise UpdateFailed("Modbus: żadnego sensora nie udało się odczytać")
 
-        if errors:
-            for a, msg in errors:
-                _LOGGER.warning("ORNO: problem z adresem %s: %s", a, msg)
+        for unit_id, a, msg in errors:
+            if self.units[unit_id].online:
+                _LOGGER.warning("ORNO: unit %s, problem z adresem %s: %s", unit_id, a, msg)
 
+        read_at = time.time()
+        for unit_id, count in decoded.items():
+            if count:
+                if not windowed:
+                    results[unit_id].read_at = read_at
+                self.units[unit_id].restored = False
+        if self._snapshot is not None and decoded_total:
+            # Ponowne planowanie przesuwa oczekujący zapis - przy cyklu krótszym niż opóźnienie
+            # zapis nie nastąpiłby nigdy, więc planujemy go najwyżej raz na interwał.
+            now = time.monotonic()
+            if now >= self._snapshot_save_at:
+                self._snapshot_save_at = now + SNAPSHOT_SAVE_INTERVAL_S
+                self._snapshot.schedule_save(self._snapshot_data)
+        self._emit_samples(read_at)
+
+        self.updated_keys = updated
         return results
 
+    def _deadline_s(self) -> float:
+        """Termin cyklu: część najdłuższego okresu należnych klas, co najmniej limit czasu zapytania."""
+        adaptive = self.adaptive
+        periods = [adaptive.period(rate) if adaptive else rate for rate in self._due_rates]
+        return max(max(periods, default=0.0) * POLL_DEADLINE_FACTOR, POLL_MIN_DEADLINE_S)
+
+    @staticmethod
+    def _block_key(unit: _UnitState, block: ReadBlock) -> Tuple[int, str, int, int]:
+        return unit.unit_id, block.input_type, block.address, block.count
+
+    def async_add_key_listener(self, key: Tuple[int, int], listener: Callable[[], None]) -> Callable[[], None]:
+        """Rejestruje encję wartości (unit_id, slot) do publikacji częściowych w trakcie cyklu."""
+        self._key_listeners[key] = listener
+
+        def remove() -> None:
+            if self._key_listeners.get(key) is listener:
+                del self._key_listeners[key]
+
+        return remove
+
+    def _publish_keys(self, keys: Set[Tuple[int, int]]) -> None:
+        """Publikuje część cyklu: powiadamia tylko encje wartości, które się zmieniły."""
+        self.updated_keys = keys
+        try:
+            for key in keys:
+                listener = self._key_listeners.get(key)
+                if listener is not None:
+                    listener()
+        finally:
+            self.updated_keys = set()
+
+    def _mark_stale(
+        self, unit: _UnitState, block: ReadBlock, stale: bool, updated: Set[Tuple[int, int]]
+    ) -> None:
+        flags = unit.stale
+        for fld in block.fields:
+            if flags[fld.slot] != stale:
+                flags[fld.slot] = stale
+                updated.add((unit.unit_id, fld.slot))
+
+    def _mark_read(self, unit: _UnitState, block: ReadBlock, regs: Any, updated: Set[Tuple[int, int]]) -> None:
+        """Zdejmuje flagę nieaktualności z odczytanych pól; pola bez odpowiedzi ją dostają."""
+        failed = regs.failed if isinstance(regs, _PartialRead) else ()
+        flags = unit.stale
+        for fld in block.fields:
+            stale = fld.slot in failed
+            if flags[fld.slot] != stale:
+                flags[fld.slot] = stale
+                updated.add((unit.unit_id, fld.slot))
+
+    @staticmethod
+    def _block_values(block: ReadBlock, regs: Any) -> List[Tuple[ReadField, Any]]:
+        if isinstance(regs, _PartialRead):
+            return regs.decoder.decode(regs.regs)
+        return block.decoder.decode(regs)
+
+    def _late_block(self, key: Tuple[int, str, int, int], unit: _UnitState, block: ReadBlock, task: asyncio.Task) -> None:
+        """Odpowiedź bloku, który nie zmieścił się w terminie cyklu."""
+        self._inflight.pop(key, None)
+        if task.cancelled():
+            return
+        updated: Set[Tuple[int, int]] = set()
+        regs = task.result() if task.exception() is None else None
+        if regs is None:
+            # Timeout lub błąd spóźnionego bloku - dopiero teraz wartości są nieaktualne.
+            self._mark_stale(unit, block, True, updated)
+            self._publish_keys(updated)
+            return
+        if self.window_s:
+            self._decode_block(unit, block, regs, unit.live, set(), [])
+            return
+        # Kopia przy zapisie: w trakcie cyklu zapis idzie do jego wyników (kopia jednostki
+        # z tego cyklu), poza cyklem do nowej kopii - opublikowana migawka się nie zmienia.
+        if self._cycle is not None:
+            results, copied = self._cycle
+        else:
+            results, copied = dict(self.data or {}), set()
+        if unit.unit_id not in copied:
+            prev = results.get(unit.unit_id)
+            results[unit.unit_id] = prev.copy() if prev is not None else UnitSnapshot(self._size)
+            copied.add(unit.unit_id)
+        snap = results[unit.unit_id]
+        if self._decode_block(unit, block, regs, snap, updated, []):
+            self._mark_read(unit, block, regs, updated)
+            snap.read_at = time.time()
+            _LOGGER.debug("ORNO: unit %s, spóźniony blok %s+%s opublikowany", unit.unit_id, block.address, block.count)
+        self.data = results
+        self._publish_keys(updated)
+
+    def _publish_derived(
+        self, unit: _UnitState, snap: UnitSnapshot, updated: Set[Tuple[int, int]], now: float
+    ) -> None:
+        raw = self._samples.get(unit.unit_id) if self._samples is not None else None
+        published_at = unit.published_at
+        # Jak dla rejestrów: martwa strefa i heartbeat, poza trybem okienkowym.
+        filtered = not self.window_s
+        for fld, value in unit.derived.compute(snap, now):
+            slot = fld.slot
+            if raw is not None:
+                raw.set(slot, value)
+            if filtered and not self._should_publish(fld, snap.get(slot), value, now, published_at):
+                continue
+            published_at[slot] = now
+            snap.set(slot, value)
+            updated.add((unit.unit_id, slot))
+            if not filtered:
+                unit.fresh[slot] = 1
+
+    def _sample_windows(
+        self, sampled: Set[int], results: Dict[int, UnitSnapshot], updated: Set[Tuple[int, int]]
+    ) -> None:
+        """Dopisuje próbki cyklu do okien i publikuje agregaty okien, które się zakończyły."""
+        wall = time.time()
+        window_s = self.window_s
+        for unit_id, unit in self.units.items():
+            if unit_id in sampled:
+                if unit.window is None:
+                    unit.window = WindowStats(self._size, wall - wall % window_s)
+                unit.window.add(unit.live, unit.fresh)
+                unit.fresh = bytearray(self._size)
+                snap = results.get(unit_id)
+                # Wartości bez opublikowanego stanu (start, migawka sprzed restartu, jednostka
+                # odczytana po raz pierwszy) nie czekają na koniec okna.
+                if unit.restored or snap is None or snap.valid != unit.live.valid:
+                    self._publish_live(unit, results, updated, wall)
+            window = unit.window
+            if window is not None and wall >= window.start + window_s:
+                self._close_window(unit, window, results, updated, wall)
+
+    def _publish_live(
+        self, unit: _UnitState, results: Dict[int, UnitSnapshot], updated: Set[Tuple[int, int]], wall: float
+    ) -> None:
+        prev = results.get(unit.unit_id)
+        snap = prev.copy() if prev is not None else UnitSnapshot(self._size)
+        live, restored = unit.live, unit.restored
+        for slot, ok in enumerate(live.valid):
+            if ok and (restored or not snap.valid[slot]):
+                snap.set(slot, live.values[slot])
+                updated.add((unit.unit_id, slot))
+        snap.read_at = wall
+        results[unit.unit_id] = snap
+
+    def _close_window(
+        self,
+        unit: _UnitState,
+        window: WindowStats,
+        results: Dict[int, UnitSnapshot],
+        updated: Set[Tuple[int, int]],
+        wall: float,
+    ) -> None:
+        unit.window = WindowStats(self._size, wall - wall % self.window_s)
+        if not window.samples:
+            return
+        unit.closed = window
+        prev = results.get(unit.unit_id)
+        snap = prev.copy() if prev is not None else UnitSnapshot(self._size)
+        for desc in self._window_mean:
+            mean = window.mean(desc.slot)
+            if mean is not None:
+                snap.set(desc.slot, round(mean) if desc.integer else mean)
+                updated.add((unit.unit_id, desc.slot))
+        for desc in self._window_last:
+            if window.count[desc.slot]:
+                snap.set(desc.slot, window.last[desc.slot])
+                updated.add((unit.unit_id, desc.slot))
+        snap.read_at = wall
+        results[unit.unit_id] = snap
+
+        if self._statistic_prefix is None or self.hass is None:
+            return
+        hour_start = window.start - window.start % HOUR_S
+        if unit.hour is None or unit.hour.start != hour_start:
+            unit.hour = WindowStats(self._size, hour_start)
+        unit.hour.merge(window)
+        if self._multi:
+            name, unit_key = f"{self.profile.model} (unit {unit.unit_id})", f"u{unit.unit_id}_"
+        else:
+            name, unit_key = self.profile.model, ""
+        add_hour_statistics(self.hass, self._statistic_prefix, name, self._window_mean, unit.hour, unit_key)
+
+    def _update_online(self, units: List[_UnitState], decoded: Dict[int, int], failed: Set[int]) -> None:
+        now = time.monotonic()
+        for unit in units:
+            if decoded[unit.unit_id]:
+                if not unit.online:
+                    _LOGGER.info("ORNO: unit %s znów odpowiada", unit.unit_id)
+                unit.online = True
+            elif unit.unit_id in failed:
+                if unit.online:
+                    _LOGGER.warning(
+                        "ORNO: unit %s nie odpowiada, kolejna próba za %s s",
+                        unit.unit_id, UNIT_OFFLINE_RETRY_S,
+                    )
+                unit.online = False
+                unit.retry_at = now + UNIT_OFFLINE_RETRY_S
+
+    async def _read(self, unit: _UnitState, kind: str, address: int, count: int) -> memoryview:
+        function = FC_READ_HOLDING_REGISTERS if kind == "holding" else FC_READ_INPUT_REGISTERS
+        self.stats.requests += 1
+        try:
+            if not unit.online:
+                # Próba jednostki offline idzie na koniec kolejki, za odczytami działających liczników.
+                return await unit.client.read_registers(function, address, count, priority=PRIORITY_LOW)
+            return await unit.client.read_registers(function, address, count)
+        except Exception:
+            self.stats.request_errors += 1
+            raise
+
+    async def _read_block(self, unit: _UnitState, block: ReadBlock, errors: List[Tuple[int, int, str]]) -> Any:
+        cache = self.register_cache
+        kind = (cache.get(block, unit.unit_id) if cache else None) or block.input_type
+        try:
+            regs = await self._read(unit, kind, block.address, block.count)
+        except ModbusConnectionError:
+            raise
+        except Exception as e1:
+            err1 = e1
+        else:
+            if cache:
+                cache.learn(block, kind, unit.unit_id)
+            return regs
+
+        # Timeout oznacza brak odpowiedzi, a nie odrzucenie kodu funkcji - drugi kod nic nie da.
+        if block.fallback and not isinstance(err1, asyncio.TimeoutError):
+            other = "input" if kind == "holding" else "holding"
+            try:
+                regs = await self._read(unit, other, block.address, block.count)
+                _LOGGER.debug(
+                    "ORNO: unit %s, blok %s+%s: fallback %s->%s OK",
+                    unit.unit_id, block.address, block.count, kind, other,
+                )
+                self.stats.fallbacks += 1
+                if cache:
+                    cache.learn(block, other, unit.unit_id)
+                return regs
+            except ModbusConnectionError:
+                raise
+            except Exception as e2:
+                msg = f"{err1} / {e2}"
+        else:
+            msg = str(err1) or type(err1).__name__
+
+        # Urządzenie odrzuciło cały blok (np. niezmapowany rejestr w przerwie) -
+        # odczytujemy pola pojedynczo, żeby nie stracić pozostałych wartości.
+        if isinstance(err1, ModbusError) and len(block.fields) > 1:
+            _LOGGER.debug("ORNO: blok %s+%s odrzucony (%s), odczyt pojedynczy", block.address, block.count, msg)
+            regs = bytearray(block.count * 2)
+            ok: List[ReadField] = []
+            failed: Set[int] = set()
+            for fld in block.fields:
+                try:
+                    part = await self._read(unit, kind, fld.address, fld.count)
+                except ModbusConnectionError:
+                    raise
+                except Exception as e3:
+                    errors.append((unit.unit_id, fld.address, str(e3)))
+                    failed.add(fld.slot)
+                    continue
+                regs[fld.offset * 2:(fld.offset + fld.count) * 2] = part
+                ok.append(fld)
+            if not ok:
+                return None
+            # Bufor jest wypełniony zerami w miejscu pól bez odpowiedzi - dekodujemy tylko
+            # odczytane pola, żeby brak odpowiedzi nie trafił do encji jako 0.
+            return _PartialRead(regs, BlockDecoder(ok), frozenset(failed)) if failed else regs
+
+        errors.append((unit.unit_id, block.address, msg))
+        return None
+
+    def _decode_block(
+        self,
+        unit: _UnitState,
+        block: ReadBlock,
+        regs: Any,
+        snap: UnitSnapshot,
+        updated: Set[Tuple[int, int]],
+        errors: List[Tuple[int, int, str]],
+    ) -> int:
+        """Dekoduje blok i publikuje zmienione wartości; zwraca liczbę zdekodowanych pól."""
+        t0 = time.perf_counter()
+        try:
+            values = self._block_values(block, regs)
+        except Exception as dec_err:
+            errors.append((unit.unit_id, block.address, f"decode error: {dec_err}"))
+            return 0
+        finally:
+            self._decode_s += time.perf_counter() - t0
+
+        now = time.monotonic()
+        published_at = unit.published_at
+        tolerance = self._tolerance
+        get = snap.get
+        # Próbki okna są zapisywane bez martwej strefy - agregaty mają widzieć każdą wartość.
+        filtered = not self.window_s
+        raw = None
+        if self._samples is not None:
+            raw = self._samples.get(unit.unit_id)
+            if raw is None:
+                raw = self._samples[unit.unit_id] = UnitSnapshot(self._size)
+        for fld, value in values:
+            slot = fld.slot
+            if raw is not None:
+                raw.set(slot, value)
+            prev = get(slot)
+            if tolerance and prev is not None:
+                tol = tolerance.get(slot)
+                if tol is not None and abs(value - prev) > max(abs(prev) * tol[0], tol[1]):
+                    self._volatile.add(self._rate_of[slot])
+            if filtered and not self._should_publish(fld, prev, value, now, published_at):
+                continue
+            published_at[slot] = now
+            snap.set(slot, value)
+            updated.add((unit.unit_id, slot))
+        if not filtered:
+            fresh = unit.fresh
+            for fld, _ in values:
+                fresh[fld.slot] = 1
+        return len(values)
+
     @staticmethod
-    def _decode_registers(regs: List[int], dtype: str, word_swap: bool) -> Any:
-        if dtype == "uint16":
-            return int(regs[0] & 0xFFFF)
-
-        if dtype == "int16":
-            val = regs[0]
-            if val & 0x8000:
-                val -= 0x10000
-            return int(val)
-
-        if dtype in ("uint32", "float32"):
-            if len(regs) < 2:
-                raise ValueError("brak dwóch rejestrów dla wartości 32-bit")
-            hi, lo = regs[0], regs[1]
-            if word_swap:
-                hi, lo = lo, hi
-            raw = (hi << 16) | lo
-            if dtype == "uint32":
-                return int(raw & 0xFFFFFFFF)
-            return struct.unpack(">f", raw.to_bytes(4, "big"))[0]
-
-        raise ValueError(f"Nieznany data_type: {dtype}")
+    def _should_publish(
+        fld: ReadField | DerivedField, prev: Any, value: Any, now: float, published_at: array
+    ) -> bool:
+        """Czy nowa wartość ma trafić do encji: zmiana poza martwą strefą albo minął heartbeat."""
+        if prev is None:
+            return True
+        if fld.heartbeat is not None and now - published_at[fld.slot] >= fld.heartbeat:
+            return True
+        if value == prev:
+            return False
+        delta = abs(value - prev)
+        if fld.deadband is not None and delta <= fld.deadband:
+            return False
+        if fld.deadband_pct is not None and delta <= abs(prev) * fld.deadband_pct / 100:
+            return False
+        return True
@@ -0,0 +1,77 @@
+
+from __future__ import annotations
+
+import struct
+from typing import TYPE_CHECKING, Any, Callable, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from .read_plan import ReadField
+
+# Kody struct dla typów rejestrów (big-endian, słowa w kolejności hi-lo).
+_FORMATS = {"uint16": "H", "int16": "h", "uint32": "I", "int32": "i", "float32": "f"}
+
+_HH = struct.Struct(">HH")
+_SWAPPED = {code: struct.Struct(f">{code}") for code in ("I", "i", "f")}
+
+
+def _swap_converter(code: str) -> Callable[[int, int], Any]:
+    """Łączy dwa słowa zapisane w kolejności lo-hi (word_swap) w jedną wartość 32-bit."""
+    unpack = _SWAPPED[code].unpack
+    pack = _HH.pack
+
+    def convert(lo: int, hi: int) -> Any:
+        return unpack(pack(hi, lo))[0]
+
+    return convert
+
+
+class BlockDecoder:
+    """Dekoder bloku rejestrów skompilowany raz z planu odczytu.
+
+    Cały blok jest rozpakowywany jednym `struct.Struct.unpack_from` bezpośrednio z bufora
+    odpowiedzi (memoryview, bez kopiowania do listy). Przerwy między polami są pomijane
+    bajtami wypełnienia, a skala, precyzja i zamiana słów są stosowane w tym samym przebiegu.
+    """
+
+    __slots__ = ("_struct", "_fields", "size")
+
+    def __init__(self, fields: Sequence[ReadField]) -> None:
+        fmt: List[str] = [">"]
+        # (pole, indeks w krotce wyniku, konwerter dla word_swap lub None, skala, precyzja)
+        compiled: List[Tuple[ReadField, int, Callable[[int, int], Any] | None, float, int | None]] = []
+        pos = 0
+        index = 0
+        for fld in sorted(fields, key=lambda f: f.offset):
+            if fld.offset < pos:
+                raise ValueError(f"Nakładające się rejestry w bloku (adres {fld.address})")
+            code = _FORMATS.get(fld.dtype)
+            if code is None:
+                raise ValueError(f"Nieznany data_type: {fld.dtype}")
+            if fld.offset > pos:
+                fmt.append(f"{(fld.offset - pos) * 2}x")
+            if fld.word_swap and fld.count == 2:
+                fmt.append("HH")
+                compiled.append((fld, index, _swap_converter(code), fld.scale, fld.precision))
+                index += 2
+            else:
+                fmt.append(code)
+                compiled.append((fld, index, None, fld.scale, fld.precision))
+                index += 1
+            pos = fld.offset + fld.count
+        self._struct = struct.Struct("".join(fmt))
+        self._fields = tuple(compiled)
+        self.size = self._struct.size
+
+    def decode(self, buf: Any) -> List[Tuple[ReadField, Any]]:
+        if len(buf) < self.size:
+            raise ValueError(f"za krótka odpowiedź ({len(buf)} B, oczekiwano {self.size} B)")
+        raw = self._struct.unpack_from(buf)
+        out: List[Tuple[ReadField, Any]] = []
+        for fld, idx, convert, scale, precision in self._fields:
+            value = raw[idx] if convert is None else convert(raw[idx], raw[idx + 1])
+            if scale != 1.0:
+                value = value * scale
+            if precision is not None:
+                value = round(value, precision)
+            out.append((fld, value))
+        return out
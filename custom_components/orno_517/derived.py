@@ -0,0 +1,174 @@
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from .snapshot import UnitSnapshot
+
+# Całkowanie mocy jest przerywane, gdy między odczytami minęło więcej niż tyle sekund
+# (brak danych / restart) - lepiej pominąć odcinek niż dopisać energię "na oko".
+INTEGRAL_MAX_GAP_S = 300
+
+# Pola sensora przenoszone z definicji wartości pochodnej do encji.
+_SENSOR_FIELDS = ("unit", "device_class", "state_class", "precision")
+# Parametry publikacji (jak dla rejestrów) - z definicji zastępowanego rejestru lub wartości.
+_PUBLISH_FIELDS = ("deadband", "deadband_pct", "heartbeat")
+
+
+def _sum(*values: float) -> float:
+    return sum(values)
+
+
+def _ratio(a: float, b: float) -> float | None:
+    if not b:
+        return None
+    return max(-1.0, min(1.0, a / b))
+
+
+def _imbalance(*values: float) -> float:
+    """Asymetria [%]: największe odchylenie od średniej względem średniej."""
+    mean = sum(values) / len(values)
+    if not mean:
+        return 0.0
+    return max(abs(v - mean) for v in values) / mean * 100
+
+
+def _neutral(a: float, b: float, c: float) -> float:
+    """Prąd przewodu neutralnego przy fazach przesuniętych o 120° (bez harmonicznych i kątów mocy)."""
+    return math.sqrt(max(0.0, a * a + b * b + c * c - a * b - b * c - c * a))
+
+
+# fn -> (funkcja, minimalna liczba wejść, maksymalna liczba wejść); "integral" liczony osobno.
+_FUNCTIONS: Dict[str, Tuple[Callable[..., Any] | None, int, int]] = {
+    "sum": (_sum, 2, 16),
+    "ratio": (_ratio, 2, 2),
+    "imbalance": (_imbalance, 2, 16),
+    "neutral": (_neutral, 3, 3),
+    "integral": (None, 1, 1),
+}
+
+
+def parse_derived(raw: Iterable[Dict[str, Any]], registers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Waliduje sekcję "derived" profilu; ValueError przy błędach.
+
+    Wartość o nazwie istniejącego rejestru zastępuje go (ten sam adres i encja, rejestr
+    nie jest wtedy odczytywany). Nowa wartość musi mieć "key" - stały identyfikator encji.
+    Wejściami mogą być rejestry albo wcześniej zdefiniowane wartości pochodne.
+    """
+    by_name = {d["name"]: d for d in registers}
+    derived: List[Dict[str, Any]] = []
+    known = set(by_name)
+    keys = set()
+    for item in raw:
+        name = item.get("name")
+        fn = item.get("fn")
+        inputs = list(item.get("inputs") or [])
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"wartość pochodna bez nazwy: {item}")
+        if fn not in _FUNCTIONS:
+            raise ValueError(f"{name}: nieznana funkcja {fn}")
+        _, low, high = _FUNCTIONS[fn]
+        if not low <= len(inputs) <= high:
+            raise ValueError(f"{name}: {fn} wymaga {low}-{high} wejść")
+        missing = [i for i in inputs if i not in known or i == name]
+        if missing:
+            raise ValueError(f"{name}: nieznane wejścia {missing}")
+        register = by_name.get(name)
+        if register is not None:
+            d = {
+                k: register[k]
+                for k in ("name", "address", "slot", *_SENSOR_FIELDS, *_PUBLISH_FIELDS)
+                if k in register
+            }
+        else:
+            key = item.get("key")
+            if not isinstance(key, str) or not key or key in keys:
+                raise ValueError(f"{name}: brak lub zdublowany klucz")
+            keys.add(key)
+            d = {"name": name, "key": key, "state_class": "measurement"}
+            d.update({k: item[k] for k in (*_SENSOR_FIELDS, *_PUBLISH_FIELDS) if k in item})
+        d["fn"] = fn
+        d["inputs"] = inputs
+        derived.append(d)
+        known.add(name)
+    return derived
+
+
+def _optional_float(value: Any) -> float | None:
+    return float(value) if value is not None else None
+
+
+@dataclass(frozen=True)
+class DerivedField:
+    """Wartość pochodna w kroku obliczeń: slot wyniku, precyzja i martwa strefa (jak w ReadField)."""
+
+    name: str
+    slot: int
+    precision: int | None = None
+    deadband: float | None = None
+    deadband_pct: float | None = None
+    heartbeat: float | None = None
+
+
+class DerivedCalculator:
+    """Wartości pochodne jednej jednostki, liczone jednym przebiegiem po każdym odczycie.
+
+    Kroki są przygotowane raz (pole wyniku, funkcja, krotka slotów wejść), w kolejności z profilu,
+    więc wartość może korzystać z wcześniej policzonych (z pełną dokładnością). Wyniki są
+    zaokrąglane do precyzji wartości, a o publikacji decyduje koordynator - tak samo jak dla
+    rejestrów. Całki (energia z mocy) liczone są metodą trapezów na własnej sumie, bez
+    zaokrągleń; punktem startu jest bieżąca wartość (np. z migawki sprzed restartu).
+    """
+
+    __slots__ = ("_steps", "_integrals")
+
+    def __init__(self, derived: Iterable[Dict[str, Any]], slots: Dict[str, int]) -> None:
+        self._steps = [
+            (
+                DerivedField(
+                    d["name"],
+                    d["slot"],
+                    int(d["precision"]) if d.get("precision") is not None else None,
+                    _optional_float(d.get("deadband")),
+                    _optional_float(d.get("deadband_pct")),
+                    _optional_float(d.get("heartbeat")),
+                ),
+                _FUNCTIONS[d["fn"]][0],
+                tuple(slots[i] for i in d["inputs"]),
+            )
+            for d in derived
+        ]
+        # slot -> (czas monotoniczny, wartość wejścia, suma) z poprzedniego kroku całkowania.
+        self._integrals: Dict[int, Tuple[float, float, float]] = {}
+
+    def compute(self, snapshot: UnitSnapshot, now: float) -> List[Tuple[DerivedField, float]]:
+        exact: Dict[int, float] = {}
+        out: List[Tuple[DerivedField, float]] = []
+        get = snapshot.get
+        for fld, func, inputs in self._steps:
+            args = [exact[i] if i in exact else get(i) for i in inputs]
+            if None in args:
+                continue
+            if func is None:
+                result = self._integrate(fld.slot, args[0], get(fld.slot), now)
+            else:
+                result = func(*args)
+            if result is None:
+                continue
+            exact[fld.slot] = result
+            out.append((fld, round(result, fld.precision) if fld.precision is not None else result))
+        return out
+
+    def _integrate(self, slot: int, value: float, current: float | None, now: float) -> float:
+        # Suma jest trzymana tutaj, a nie odczytywana z migawki: wynik niepublikowany (martwa
+        # strefa) ani zaokrąglony nie może gubić przyrostów energii.
+        last = self._integrals.get(slot)
+        total = last[2] if last is not None else float(current or 0.0)
+        if last is not None:
+            dt = now - last[0]
+            if 0 < dt <= INTEGRAL_MAX_GAP_S:
+                total += (last[1] + value) / 2 * dt / 3600
+        self._integrals[slot] = (now, value, total)
+        return total
@@ -0,0 +1,49 @@
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+TO_REDACT = {CONF_HOST}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> Dict[str, Any]:
+    data = hass.data[DOMAIN][entry.entry_id]
+    coordinator = data["coordinator"]
+    client = data["gateway"].client
+    snapshots = coordinator.data or {}
+
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "connection": {
+            "state": client.state,
+            "framing": client.framing,
+            "max_in_flight": client.max_in_flight,
+            "capture": client.capture.as_dict() if client.capture is not None else None,
+        },
+        "client": client.stats.as_dict(),
+        "profile": coordinator.profile.key,
+        "setup_ms": data.get("setup_ms"),
+        "poll": coordinator.stats.as_dict(),
+        "adaptive": coordinator.adaptive.as_dict() if coordinator.adaptive else None,
+        "derived": [d["name"] for d in coordinator.derived],
+        "window_s": coordinator.window_s,
+        "units": {
+            unit_id: {
+                "online": unit.online,
+                "restored": unit.restored,
+                "read_at": snapshots[unit_id].read_at if unit_id in snapshots else None,
+                "window_samples": unit.window.samples if unit.window is not None else None,
+            }
+            for unit_id, unit in coordinator.units.items()
+        },
+        "register_types": data["register_cache"].types,
+        "last_update_success": coordinator.last_update_success,
+        "data": {unit_id: coordinator.values(unit_id) for unit_id in coordinator.units},
+    }
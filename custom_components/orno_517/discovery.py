@@ -0,0 +1,68 @@
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import struct
+from dataclasses import dataclass
+from typing import Iterable, List
+
+from .const import DISCOVERY_PROBE_TIMEOUT, DISCOVERY_REGISTER
+from .gateway import PRIORITY_LOW, ModbusGateway
+from .modbus_client import FC_READ_HOLDING_REGISTERS, ModbusConnectionError, ModbusError
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class DiscoveredUnit:
+    unit_id: int
+    # Zawartość rejestru identyfikatora; None, gdy urządzenie odpowiedziało wyjątkiem.
+    meter_id: int | None
+
+
+async def _async_probe(gateway: ModbusGateway, unit_id: int, timeout: float) -> DiscoveredUnit | None:
+    try:
+        payload = await gateway.submit(
+            unit_id,
+            lambda c: c.read_registers(
+                FC_READ_HOLDING_REGISTERS, DISCOVERY_REGISTER, 1, unit=unit_id, timeout=timeout
+            ),
+            PRIORITY_LOW,
+        )
+    except asyncio.TimeoutError:
+        return None
+    except ModbusConnectionError:
+        raise
+    except ModbusError as err:
+        # Odpowiedź z wyjątkiem też oznacza, że pod tym adresem jest urządzenie.
+        _LOGGER.debug("ORNO: unit %s odpowiada wyjątkiem: %s", unit_id, err)
+        return DiscoveredUnit(unit_id, None)
+    return DiscoveredUnit(unit_id, struct.unpack(">H", payload)[0])
+
+
+async def async_scan_units(
+    gateway: ModbusGateway,
+    unit_ids: Iterable[int],
+    timeout: float = DISCOVERY_PROBE_TIMEOUT,
+) -> List[DiscoveredUnit]:
+    """Sonduje jednostki przez kolejkę bramki; zwraca te, które odpowiedziały.
+
+    Sondy trafiają do kolejki z niskim priorytetem, za bieżącymi odczytami skonfigurowanych
+    liczników, a liczbę zapytań w locie ogranicza `max_in_flight` bramki (przy RTU zawsze 1).
+    Limit czasu sondy liczy się od wysłania, ale bramka RS485 i tak obsługuje zapytania po
+    kolei - sonda stojąca w kolejce bramki mogła nie zdążyć, więc każdy adres bez odpowiedzi
+    jest przed uznaniem za pusty sprawdzany jeszcze raz, pojedynczo.
+    """
+    await gateway.client.connect()
+    unit_ids = list(unit_ids)
+    results = await asyncio.gather(*(_async_probe(gateway, u, timeout) for u in unit_ids))
+    found = [r for r in results if r is not None]
+    for unit_id, result in zip(unit_ids, results):
+        if result is None:
+            retry = await _async_probe(gateway, unit_id, timeout)
+            if retry is not None:
+                found.append(retry)
+    found.sort(key=lambda r: r.unit_id)
+    _LOGGER.debug("ORNO: wyszukiwanie jednostek na %s: %s", gateway.key, [r.unit_id for r in found])
+    return found
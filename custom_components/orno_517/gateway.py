@@ -0,0 +1,198 @@
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List
+
+from homeassistant.core import HomeAssistant
+
+from .modbus_client import ModbusTcpClient
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_GATEWAYS = "orno_517_gateways"
+
+# Niższa wartość = wyższy priorytet.
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    unit: int = field(compare=False)
+    call: Callable[[ModbusTcpClient], Awaitable[Any]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class ModbusGateway:
+    """Jedno współdzielone połączenie do bramki (host:port) z harmonogramem zapytań.
+
+    Każdy unit_id ma własną kolejkę priorytetową. Planista wybiera najwyższy priorytet
+    spośród czół kolejek, a przy równym priorytecie obsługuje jednostki po kolei (round-robin),
+    więc jeden licznik nie zagłodzi pozostałych. Liczba zapytań wysłanych naraz jest
+    ograniczona przez `max_in_flight` klienta (domyślnie 1 = pełna serializacja magistrali).
+    """
+
+    def __init__(self, host: str, port: int, client: ModbusTcpClient) -> None:
+        self.host = host
+        self.port = port
+        self.client = client
+        self._queues: Dict[int, List[_Job]] = {}
+        self._order: Deque[int] = deque()
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(client.max_in_flight)
+        self._worker: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+        self._refs = 0
+
+    @property
+    def key(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def unit(self, unit_id: int, priority: int = PRIORITY_NORMAL) -> "GatewayUnit":
+        return GatewayUnit(self, unit_id, priority)
+
+    async def submit(
+        self,
+        unit: int,
+        call: Callable[[ModbusTcpClient], Awaitable[Any]],
+        priority: int = PRIORITY_NORMAL,
+    ) -> Any:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.setdefault(unit, [])
+        if not queue:
+            self._order.append(unit)
+        heapq.heappush(queue, _Job(priority, next(self._seq), unit, call, future))
+        self._wakeup.set()
+        return await future
+
+    def _pop_next(self) -> _Job | None:
+        if not self._order:
+            return None
+        best = min(self._queues[u][0].priority for u in self._order)
+        for unit in self._order:
+            queue = self._queues[unit]
+            if queue[0].priority == best:
+                job = heapq.heappop(queue)
+                self._order.remove(unit)
+                if queue:
+                    self._order.append(unit)
+                else:
+                    del self._queues[unit]
+                return job
+        return None
+
+    async def _run(self) -> None:
+        while True:
+            await self._slots.acquire()
+            job = self._pop_next()
+            while job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                job = self._pop_next()
+            if job.future.done():
+                # Wywołujący zrezygnował (np. anulowany cykl koordynatora).
+                self._slots.release()
+                continue
+            task = asyncio.get_running_loop().create_task(self._execute(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _execute(self, job: _Job) -> None:
+        try:
+            result = await job.call(self.client)
+        except Exception as err:
+            if not job.future.done():
+                job.future.set_exception(err)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._slots.release()
+
+    async def close(self) -> None:
+        if self._worker:
+            self._worker.cancel()
+            self._worker = None
+        for queue in self._queues.values():
+            for job in queue:
+                if not job.future.done():
+                    job.future.cancel()
+        self._queues.clear()
+        self._order.clear()
+        await self.client.close()
+
+
+class GatewayUnit:
+    """Widok bramki dla jednego urządzenia - interfejs odczytu zgodny z ModbusTcpClient."""
+
+    def __init__(self, gateway: ModbusGateway, unit_id: int, priority: int = PRIORITY_NORMAL) -> None:
+        self.gateway = gateway
+        self.unit_id = unit_id
+        self.priority = priority
+
+    async def read_registers(
+        self, function: int, address: int, count: int, priority: int | None = None
+    ) -> memoryview:
+        return await self.gateway.submit(
+            self.unit_id,
+            lambda c: c.read_registers(function, address, count, unit=self.unit_id),
+            self.priority if priority is None else priority,
+        )
+
+    async def read_input_registers(self, address: int, count: int, priority: int | None = None) -> List[int]:
+        return await self.gateway.submit(
+            self.unit_id,
+            lambda c: c.read_input_registers(address, count, unit=self.unit_id),
+            self.priority if priority is None else priority,
+        )
+
+    async def read_holding_registers(self, address: int, count: int, priority: int | None = None) -> List[int]:
+        return await self.gateway.submit(
+            self.unit_id,
+            lambda c: c.read_holding_registers(address, count, unit=self.unit_id),
+            self.priority if priority is None else priority,
+        )
+
+
+def async_get_gateway(hass: HomeAssistant, host: str, port: int, **client_kwargs: Any) -> ModbusGateway:
+    """Zwraca współdzieloną bramkę dla host:port, tworząc ją przy pierwszym użyciu."""
+    gateways: Dict[str, ModbusGateway] = hass.data.setdefault(DATA_GATEWAYS, {})
+    key = f"{host}:{port}"
+    gateway = gateways.get(key)
+    if gateway is None:
+        gateway = ModbusGateway(host, port, ModbusTcpClient(host, port=port, **client_kwargs))
+        gateways[key] = gateway
+        _LOGGER.debug("ORNO: nowa bramka %s", key)
+    elif client_kwargs.get("framing", gateway.client.framing) != gateway.client.framing:
+        _LOGGER.warning(
+            "ORNO: bramka %s jest już używana w trybie %s, ignoruję %s",
+            key, gateway.client.framing, client_kwargs.get("framing"),
+        )
+    elif client_kwargs.get("max_in_flight", 1) != gateway.client.max_in_flight:
+        _LOGGER.debug(
+            "ORNO: bramka %s już istnieje z max_in_flight=%s, ignoruję %s",
+            key, gateway.client.max_in_flight, client_kwargs.get("max_in_flight"),
+        )
+    gateway._refs += 1
+    return gateway
+
+
+async def async_release_gateway(hass: HomeAssistant, gateway: ModbusGateway) -> None:
+    """Zwalnia referencję; ostatni użytkownik zamyka połączenie."""
+    gateway._refs -= 1
+    if gateway._refs > 0:
+        return
+    hass.data.get(DATA_GATEWAYS, {}).pop(gateway.key, None)
+    await gateway.close()
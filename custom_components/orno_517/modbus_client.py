@@ -1,69 +1,435 @@
 
 from __future__ import annotations
-import asyncio, struct, logging
-from typing import List
+import asyncio, struct, logging, random, time
+from typing import Dict, List, Set
+
+from .stats import ClientStats
 
 _LOGGER = logging.getLogger(__name__)
 
+# Maksymalna długość ramki Modbus TCP (MBAP.length = unit + PDU, PDU <= 253 bajty).
+_MAX_MBAP_LENGTH = 254
+
+FC_READ_HOLDING_REGISTERS = 3
+FC_READ_INPUT_REGISTERS = 4
+
+FRAMING_TCP = "tcp"
+FRAMING_RTU_OVER_TCP = "rtu_over_tcp"
+FRAMINGS = (FRAMING_TCP, FRAMING_RTU_OVER_TCP)
+
+
+def _build_crc_table() -> tuple:
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+
+_CRC_TABLE = _build_crc_table()
+
+
+def crc16(data: bytes) -> int:
+    """CRC-16/MODBUS liczone tablicowo (bajt na iterację)."""
+    crc = 0xFFFF
+    table = _CRC_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+STATE_DISCONNECTED = "disconnected"
+STATE_CONNECTED = "connected"
+STATE_BACKOFF = "backoff"
+STATE_CIRCUIT_OPEN = "circuit_open"
+
 class ModbusError(Exception):
     pass
 
+class ModbusConnectionError(ModbusError):
+    """Błąd transportu: brak połączenia, zerwane gniazdo lub rozsynchronizowany strumień."""
+
+class CircuitOpenError(ModbusConnectionError):
+    """Wyłącznik otwarty po serii błędów - żądanie odrzucone bez dotykania sieci."""
+
+class _TapReader:
+    """Przekazuje odczyty strumienia i zachowuje odebrane bajty (nagrywanie przed parsowaniem)."""
+
+    __slots__ = ("_reader", "data")
+
+    def __init__(self, reader: asyncio.StreamReader) -> None:
+        self._reader = reader
+        self.data = bytearray()
+
+    async def readexactly(self, n: int) -> bytes:
+        try:
+            chunk = await self._reader.readexactly(n)
+        except asyncio.IncompleteReadError as err:
+            self.data += err.partial
+            raise
+        self.data += chunk
+        return chunk
+
 class ModbusTcpClient:
-    def __init__(self, host: str, port: int, unit_id: int = 1, timeout: float = 3.0) -> None:
+    """Klient Modbus TCP z obsługą wielu transakcji w locie (pipelining).
+
+    Odpowiedzi są przypisywane do oczekujących żądań po identyfikatorze transakcji MBAP,
+    więc spóźniona odpowiedź po timeoucie jest odrzucana zamiast trafić do kolejnego żądania.
+
+    W trybie `rtu_over_tcp` (przezroczyste bramki RS485) wysyłane są surowe ramki RTU z CRC16.
+    Koniec ramki odpowiedzi wyznaczany jest z długości przewidzianej z kodu funkcji,
+    a nie z przerw między znakami. RTU nie ma identyfikatora transakcji, więc w tym trybie
+    w locie jest zawsze jedno zapytanie, a pierwszy timeout odpowiadającej dotąd jednostki
+    zrywa połączenie (czyści bufor).
+
+    Klient sam zarządza połączeniem: zrywa gniazdo przy błędach I/O i rozsynchronizowaniu,
+    ponawia połączenie z wykładniczym opóźnieniem (z jitterem), a po `failure_threshold`
+    kolejnych błędach otwiera wyłącznik na `breaker_cooldown` sekund. Liczniki błędów zeruje
+    dopiero poprawna odpowiedź. Liczą się tylko timeouty jednostek, które już odpowiadały -
+    liczniki milczące od początku ani kolejne timeouty milczącej jednostki nie zrywają
+    połączenia, z którego korzystają pozostałe jednostki.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        unit_id: int = 1,
+        timeout: float = 3.0,
+        max_in_flight: int = 1,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        failure_threshold: int = 5,
+        breaker_cooldown: float = 60.0,
+        timeouts_before_drop: int = 2,
+        framing: str = FRAMING_TCP,
+    ) -> None:
+        if framing not in FRAMINGS:
+            raise ValueError(f"Nieznany tryb ramkowania: {framing}")
         self._host = host
         self._port = port
         self._unit = unit_id
         self._timeout = timeout
+        self._framing = framing
+        self._rtu = framing == FRAMING_RTU_OVER_TCP
+        if self._rtu:
+            max_in_flight = 1
+            timeouts_before_drop = 1
+        self._max_in_flight = max(1, int(max_in_flight))
         self._reader = None
         self._writer = None
         self._tid = 0
+        # RTU: (jednostka, kod funkcji) bieżącego zapytania - inne ramki to spóźnione odpowiedzi.
+        self._rtu_expect = (-1, -1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._slots = asyncio.Semaphore(self._max_in_flight)
+        self._connect_lock = asyncio.Lock()
+        self._reader_task: asyncio.Task | None = None
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._failure_threshold = max(1, failure_threshold)
+        self._breaker_cooldown = breaker_cooldown
+        self._timeouts_before_drop = max(1, timeouts_before_drop)
+        # Liczniki kolejnych błędów przeżywają ponowne połączenia - zeruje je dopiero odpowiedź.
+        self._failures = 0
+        # Timeouty jednostek, które dotąd odpowiadały (kryterium zerwania połączenia).
+        self._timeouts = 0
+        # unit_id -> kolejne timeouty jednostki; jednostka bez odpowiedzi to milczący licznik.
+        self._silent: Dict[int, int] = {}
+        # Jednostki, które choć raz odpowiedziały; tylko ich timeouty świadczą o awarii łącza.
+        self._answered: Set[int] = set()
+        self._retry_at = 0.0
+        self._breaker_open = False
+        self.stats = ClientStats()
+        # Opcjonalne nagrywanie ramek (capture.FrameCapture); None = wyłączone.
+        self.capture = None
 
-    async def connect(self) -> None:
+    @property
+    def max_in_flight(self) -> int:
+        return self._max_in_flight
+
+    @property
+    def framing(self) -> str:
+        return self._framing
+
+    @property
+    def state(self) -> str:
+        if self._writer:
+            return STATE_CONNECTED
+        if time.monotonic() < self._retry_at:
+            return STATE_CIRCUIT_OPEN if self._breaker_open else STATE_BACKOFF
+        return STATE_DISCONNECTED
+
+    def _check_available(self) -> None:
         if self._writer:
             return
-        _LOGGER.debug("Connecting Modbus TCP to %s:%s (unit=%s)", self._host, self._port, self._unit)
-        self._reader, self._writer = await asyncio.wait_for(
-            asyncio.open_connection(self._host, self._port), timeout=self._timeout
+        remaining = self._retry_at - time.monotonic()
+        if remaining <= 0:
+            return
+        if self._breaker_open:
+            raise CircuitOpenError(
+                f"Modbus {self._host}:{self._port}: wyłącznik otwarty jeszcze {remaining:.0f} s"
+            )
+        raise ModbusConnectionError(
+            f"Modbus {self._host}:{self._port}: ponowne połączenie za {remaining:.1f} s"
         )
 
-    async def close(self) -> None:
+    def _record_success(self, unit: int) -> None:
+        if self._breaker_open:
+            _LOGGER.info("Modbus %s:%s: połączenie przywrócone, wyłącznik zamknięty", self._host, self._port)
+        self._failures = 0
+        self._timeouts = 0
+        self._silent.pop(unit, None)
+        self._answered.add(unit)
+        self._retry_at = 0.0
+        self._breaker_open = False
+
+    def _record_failure(self) -> None:
+        self._failures += 1
+        now = time.monotonic()
+        if self._failures >= self._failure_threshold:
+            if not self._breaker_open:
+                _LOGGER.warning(
+                    "Modbus %s:%s: %s kolejnych błędów, wyłącznik otwarty na %s s",
+                    self._host, self._port, self._failures, self._breaker_cooldown,
+                )
+            self._breaker_open = True
+            self._retry_at = now + self._breaker_cooldown
+            return
+        delay = min(self._backoff_max, self._backoff_base * (2 ** (self._failures - 1)))
+        self._retry_at = now + random.uniform(delay / 2, delay)
+
+    async def connect(self) -> None:
         if self._writer:
-            self._writer.close()
+            return
+        async with self._connect_lock:
+            if self._writer:
+                return
+            self._check_available()
+            _LOGGER.debug("Connecting Modbus TCP to %s:%s (unit=%s)", self._host, self._port, self._unit)
             try:
-                await self._writer.wait_closed()
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self._host, self._port), timeout=self._timeout
+                )
+            except (OSError, asyncio.TimeoutError) as err:
+                self._record_failure()
+                raise ModbusConnectionError(
+                    f"Nie można połączyć z {self._host}:{self._port}: {err!r}"
+                ) from err
+            self._reader, self._writer = reader, writer
+            self.stats.connects += 1
+            self._reader_task = asyncio.get_running_loop().create_task(self._read_loop(reader))
+
+    def _drop(self, err: Exception) -> None:
+        """Zrywa bieżące gniazdo bez czekania; kolejne żądanie połączy się od nowa."""
+        task, self._reader_task = self._reader_task, None
+        if task and task is not asyncio.current_task():
+            task.cancel()
+        self._fail_pending(err)
+        writer, self._writer = self._writer, None
+        self._reader = None
+        if writer:
+            writer.close()
+
+    async def close(self) -> None:
+        writer = self._writer
+        self._drop(ModbusConnectionError("Połączenie zamknięte"))
+        if writer:
+            try:
+                await writer.wait_closed()
             except Exception:
                 pass
-        self._reader = None
-        self._writer = None
 
-    async def _send_pdu(self, pdu: bytes) -> bytes:
-        if not self._writer or not self._reader:
-            await self.connect()
-        self._tid = (self._tid + 1) & 0xFFFF
-        length = len(pdu) + 1  # + unit
-        mbap = struct.pack(">HHHB", self._tid, 0, length, self._unit)
-        self._writer.write(mbap + pdu)
-        await self._writer.drain()
-
-        hdr = await asyncio.wait_for(self._reader.readexactly(7), timeout=self._timeout)
-        tid, _, length, unit = struct.unpack(">HHHB", hdr)
-        pdu_len = length - 1
-        data = await asyncio.wait_for(self._reader.readexactly(pdu_len), timeout=self._timeout)
-        if data and (data[0] & 0x80):
+    def _fail_pending(self, err: Exception) -> None:
+        pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(err)
+
+    def _next_tid(self) -> int:
+        if self._rtu:
+            return 0
+        while True:
+            self._tid = (self._tid + 1) & 0xFFFF
+            if self._tid not in self._pending:
+                return self._tid
+
+    def _encode(self, tid: int, unit: int, pdu: bytes) -> bytes:
+        if self._rtu:
+            frame = bytes((unit,)) + pdu
+            return frame + struct.pack("<H", crc16(frame))
+        return struct.pack(">HHHB", tid, 0, len(pdu) + 1, unit) + pdu
+
+    @staticmethod
+    async def _read_frame_tcp(reader: asyncio.StreamReader) -> tuple:
+        hdr = await reader.readexactly(7)
+        tid, proto, length, unit = struct.unpack(">HHHB", hdr)
+        if proto != 0 or length < 2 or length > _MAX_MBAP_LENGTH:
+            raise ModbusConnectionError(
+                f"Niepoprawny nagłówek MBAP (proto={proto}, length={length})"
+            )
+        return tid, unit, await reader.readexactly(length - 1)
+
+    @staticmethod
+    async def _read_frame_rtu(reader: asyncio.StreamReader) -> tuple:
+        head = await reader.readexactly(2)
+        unit, function = head[0], head[1]
+        # Długość reszty ramki wynika z kodu funkcji (bez CRC liczonego osobno).
+        if function & 0x80:
+            rest = await reader.readexactly(1 + 2)
+        elif function in (1, 2, 3, 4):
+            byte_count = await reader.readexactly(1)
+            rest = byte_count + await reader.readexactly(byte_count[0] + 2)
+        elif function in (5, 6, 15, 16):
+            rest = await reader.readexactly(4 + 2)
+        else:
+            raise ModbusConnectionError(f"Nieobsługiwany kod funkcji w ramce RTU: {function}")
+        frame = head + rest
+        if crc16(frame[:-2]) != struct.unpack("<H", frame[-2:])[0]:
+            raise ModbusConnectionError("Błędna suma CRC w ramce RTU")
+        return 0, unit, frame[1:-2]
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        read_frame = self._read_frame_rtu if self._rtu else self._read_frame_tcp
+        try:
+            while True:
+                capture = self.capture
+                if capture is None:
+                    tid, unit, data = await read_frame(reader)
+                else:
+                    # Nagrywane są bajty odebrane z gniazda przed parsowaniem, także ramki
+                    # odrzucone (zły nagłówek, CRC, ucięte) - z flagą błędu.
+                    tap = _TapReader(reader)
+                    try:
+                        tid, unit, data = await read_frame(tap)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception:
+                        if tap.data:
+                            capture.add_response(bytes(tap.data), invalid=True)
+                        raise
+                    capture.add_response(bytes(tap.data))
+                if self._rtu and (unit, data[0] & 0x7F) != self._rtu_expect:
+                    fut = None
+                else:
+                    fut = self._pending.pop(tid, None)
+                if fut is None or fut.done():
+                    self.stats.orphans += 1
+                    _LOGGER.debug("Odrzucono osieroconą odpowiedź Modbus (tid=%s, unit=%s)", tid, unit)
+                    continue
+                fut.set_result((unit, data))
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            _LOGGER.debug("Modbus %s:%s: pętla odczytu zakończona: %r", self._host, self._port, err)
+            if self._reader is reader:
+                self._reader_task = None
+                self._record_failure()
+                self._drop(ModbusConnectionError(f"Połączenie zerwane: {err!r}"))
+
+    async def _send_pdu(self, pdu: bytes, unit: int | None = None, timeout: float | None = None) -> bytes:
+        """Wysyła PDU i czeka na odpowiedź.
+
+        Jawny `timeout` oznacza sondowanie (np. wyszukiwanie jednostek): brak odpowiedzi
+        jest wtedy spodziewany i nie liczy się do backoffu ani wyłącznika.
+        """
+        unit_id = self._unit if unit is None else unit
+        probe = timeout is not None
+        async with self._slots:
+            if not self._writer or not self._reader:
+                await self.connect()
+            tid = self._next_tid()
+            self._rtu_expect = (unit_id, pdu[0])
+            fut = asyncio.get_running_loop().create_future()
+            self._pending[tid] = fut
+            stats = self.stats
+            stats.requests += 1
+            try:
+                frame = self._encode(tid, unit_id, pdu)
+                started = time.monotonic()
+                self._writer.write(frame)
+                stats.bytes_sent += len(frame)
+                if self.capture is not None:
+                    self.capture.add_request(frame)
+                await self._writer.drain()
+                reply_unit, data = await asyncio.wait_for(fut, timeout=timeout if probe else self._timeout)
+                stats.rtt.add((time.monotonic() - started) * 1000)
+                stats.bytes_received += len(data)
+            except asyncio.TimeoutError:
+                stats.timeouts += 1
+                if probe:
+                    # Połączenie zostaje także w RTU: milcząca jednostka nic nie przyśle, a spóźniona
+                    # odpowiedź sondy jest odrzucana, bo nie pasuje jednostką lub kodem funkcji
+                    # do kolejnego zapytania.
+                    raise
+                missed = self._silent.get(unit_id, 0)
+                self._silent[unit_id] = missed + 1
+                # Jednostka, która nigdy nie odpowiedziała (wyłączony lub nieistniejący licznik
+                # za bramką), nie wpływa na połączenie - pozostałe liczniki dalej są odpytywane.
+                if unit_id not in self._answered:
+                    raise
+                # Pojedynczy timeout po udanej wymianie nie opóźnia ponownego połączenia.
+                if self._failures:
+                    self._record_failure()
+                else:
+                    self._failures = 1
+                # Kolejne timeouty jednostki, która już milczy, nie świadczą o awarii łącza.
+                if not missed:
+                    self._timeouts += 1
+                # Otwarty wyłącznik też zrywa połączenie, żeby kolejne żądania były od razu odrzucane.
+                if self._breaker_open or self._timeouts >= self._timeouts_before_drop:
+                    _LOGGER.debug(
+                        "Modbus %s:%s: %s timeoutów z rzędu, zrywam połączenie",
+                        self._host, self._port, self._timeouts,
+                    )
+                    self._timeouts = 0
+                    self._drop(ModbusConnectionError("Połączenie zerwane po serii timeoutów"))
+                raise
+            except ModbusConnectionError:
+                stats.transport_errors += 1
+                raise
+            except OSError as err:
+                stats.transport_errors += 1
+                self._record_failure()
+                self._drop(ModbusConnectionError(f"Błąd zapisu: {err!r}"))
+                raise ModbusConnectionError(f"Błąd zapisu do {self._host}:{self._port}: {err!r}") from err
+            finally:
+                # Po timeoucie spóźniona odpowiedź zostanie odrzucona w _read_loop.
+                if self._pending.get(tid) is fut:
+                    del self._pending[tid]
+
+        if reply_unit != unit_id or not data or (data[0] & 0x7F) != pdu[0]:
+            # Odpowiedź nie pasuje do żądania - strumień jest rozsynchronizowany.
+            self.stats.transport_errors += 1
+            self._record_failure()
+            self._drop(ModbusConnectionError("Rozsynchronizowany strumień Modbus"))
+            raise ModbusConnectionError(
+                f"Niezgodna odpowiedź (unit={reply_unit}, function={data[:1].hex()}), oczekiwano "
+                f"unit={unit_id}, function={pdu[0]:02x}"
+            )
+        self._record_success(unit_id)
+        if data[0] & 0x80:
+            self.stats.device_errors += 1
             code = data[1] if len(data) > 1 else 0
             raise ModbusError(f"Exception from device (function={data[0]&0x7F}, code={code})")
         return data
 
-    async def read_holding_registers(self, address: int, count: int) -> List[int]:
-        pdu = struct.pack(">BHH", 3, address, count)
-        data = await self._send_pdu(pdu)
+    async def read_registers(
+        self, function: int, address: int, count: int, unit: int | None = None, timeout: float | None = None
+    ) -> memoryview:
+        """Odczyt FC03/FC04; zwraca widok na bajty rejestrów w odpowiedzi (bez kopiowania)."""
+        pdu = struct.pack(">BHH", function, address, count)
+        data = await self._send_pdu(pdu, unit, timeout)
         byte_count = data[1]
-        regs = list(struct.unpack(f">{byte_count//2}H", data[2:2+byte_count]))
-        return regs
+        if byte_count != count * 2 or len(data) < 2 + byte_count:
+            raise ModbusError(f"Niepoprawna długość odpowiedzi ({byte_count} B dla {count} rejestrów)")
+        return memoryview(data)[2:2 + byte_count]
 
-    async def read_input_registers(self, address: int, count: int) -> List[int]:
-        pdu = struct.pack(">BHH", 4, address, count)
-        data = await self._send_pdu(pdu)
-        byte_count = data[1]
-        regs = list(struct.unpack(f">{byte_count//2}H", data[2:2+byte_count]))
-        return regs
+    async def read_holding_registers(self, address: int, count: int, unit: int | None = None) -> List[int]:
+        payload = await self.read_registers(FC_READ_HOLDING_REGISTERS, address, count, unit)
+        return list(struct.unpack(f">{count}H", payload))
+
+    async def read_input_registers(self, address: int, count: int, unit: int | None = None) -> List[int]:
+        payload = await self.read_registers(FC_READ_INPUT_REGISTERS, address, count, unit)
+        return list(struct.unpack(f">{count}H", payload))
@@ -0,0 +1,126 @@
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Tuple
+
+from .const import FAST_SCAN_INTERVAL, SLOW_SCAN_INTERVAL
+from .derived import parse_derived
+from .read_plan import ReadBlock, build_read_plan, register_count
+from .snapshot import ValueDescriptor
+
+_LOGGER = logging.getLogger(__name__)
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+DATA_PROFILES = "orno_517_profiles"
+
+# Symboliczne okresy odpytywania w plikach profili.
+_INTERVALS = {"fast": FAST_SCAN_INTERVAL, "slow": SLOW_SCAN_INTERVAL}
+_DTYPES = ("uint16", "int16", "uint32", "int32", "float32")
+_INPUT_TYPES = ("input", "holding")
+
+
+@dataclass
+class DeviceProfile:
+    """Mapa rejestrów jednego modelu licznika wczytana z `profiles/<klucz>.json`.
+
+    `defs` mają ten sam format co dotychczasowe definicje sensorów (słowniki z name,
+    address, dtype, ...), a `derived` to wartości liczone lokalnie z innych rejestrów.
+    `descriptors` zamraża wszystkie wartości (rejestry, potem nowe wartości pochodne)
+    w niezmiennych opisach ze stałymi slotami - wspólnymi dla wszystkich wpisów z profilem.
+    Plany odczytu są kompilowane raz na profil i zestaw rejestrów, więc wszystkie wpisy
+    i jednostki z tym samym modelem współdzielą bloki i dekodery.
+    """
+
+    key: str
+    model: str
+    manufacturer: str
+    defs: List[Dict[str, Any]]
+    derived: List[Dict[str, Any]] = field(default_factory=list)
+    descriptors: Tuple[ValueDescriptor, ...] = ()
+    # nazwa -> slot
+    slots: Dict[str, int] = field(default_factory=dict)
+    _plans: Dict[Tuple[FrozenSet[str], int], List[ReadBlock]] = field(default_factory=dict, repr=False)
+
+    def read_plan(self, defs: Iterable[Dict[str, Any]], max_gap: int) -> List[ReadBlock]:
+        defs = list(defs)
+        key = (frozenset(d["name"] for d in defs), max_gap)
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._plans[key] = build_read_plan(defs, max_gap=max_gap)
+        return plan
+
+
+def _parse_register(raw: Dict[str, Any], defaults: Dict[str, Any]) -> Dict[str, Any]:
+    d = {**defaults, **raw}
+    if not isinstance(d.get("name"), str) or not d["name"]:
+        raise ValueError(f"rejestr bez nazwy: {raw}")
+    address = d.get("address")
+    d["address"] = int(address, 0) if isinstance(address, str) else int(address)
+    if not 0 <= d["address"] <= 0xFFFF:
+        raise ValueError(f"{d['name']}: adres poza zakresem")
+    d.setdefault("dtype", "uint16")
+    if d["dtype"] not in _DTYPES:
+        raise ValueError(f"{d['name']}: nieznany dtype {d['dtype']}")
+    d.setdefault("input_type", "holding")
+    if d["input_type"] not in _INPUT_TYPES:
+        raise ValueError(f"{d['name']}: nieznany input_type {d['input_type']}")
+    interval = d.get("interval")
+    if isinstance(interval, str):
+        if interval not in _INTERVALS:
+            raise ValueError(f"{d['name']}: nieznany interval {interval}")
+        d["interval"] = _INTERVALS[interval]
+    return d
+
+
+def parse_profile(key: str, raw: Dict[str, Any]) -> DeviceProfile:
+    """Waliduje surowy profil; ValueError przy błędach (zdublowane nazwy, nakładające się rejestry, ...)."""
+    defaults = dict(raw.get("defaults") or {})
+    defs = [_parse_register(r, defaults) for r in raw.get("registers") or []]
+    if not defs:
+        raise ValueError(f"profil {key}: brak rejestrów")
+    names = [d["name"] for d in defs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"profil {key}: zdublowane nazwy rejestrów")
+    spans = sorted(
+        (d["input_type"], d["address"], d["address"] + register_count(d["dtype"]), d["name"]) for d in defs
+    )
+    for a, b in zip(spans, spans[1:]):
+        if a[0] == b[0] and b[1] < a[2]:
+            raise ValueError(f"profil {key}: nakładające się rejestry {a[3]} i {b[3]}")
+    for slot, d in enumerate(defs):
+        d["slot"] = slot
+    derived = parse_derived(raw.get("derived") or [], defs)
+    extra = [d for d in derived if "key" in d]
+    for slot, d in enumerate(extra, start=len(defs)):
+        d["slot"] = slot
+    return DeviceProfile(
+        key=key,
+        model=str(raw.get("model") or key),
+        manufacturer=str(raw.get("manufacturer") or "ORNO"),
+        defs=defs,
+        derived=derived,
+        descriptors=tuple(ValueDescriptor.from_def(d) for d in defs + extra),
+        slots={d["name"]: d["slot"] for d in defs + extra},
+    )
+
+
+def load_profile(key: str) -> DeviceProfile:
+    """Wczytuje profil z dysku (blokujące - w Home Assistant wywoływać przez executor)."""
+    if not key or os.sep in key or key.startswith("."):
+        raise ValueError(f"Niepoprawny klucz profilu: {key!r}")
+    with open(os.path.join(PROFILE_DIR, f"{key}.json"), encoding="utf-8") as f:
+        return parse_profile(key, json.load(f))
+
+
+async def async_get_profile(hass, key: str) -> DeviceProfile:
+    """Profil z pamięci podręcznej hass.data; pierwszy odczyt pliku odbywa się w executorze."""
+    profiles: Dict[str, DeviceProfile] = hass.data.setdefault(DATA_PROFILES, {})
+    profile = profiles.get(key)
+    if profile is None:
+        profile = profiles[key] = await hass.async_add_executor_job(load_profile, key)
+        _LOGGER.debug("ORNO: wczytano profil %s (%s rejestrów)", key, len(profile.defs))
+    return profile
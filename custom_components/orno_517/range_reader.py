@@ -0,0 +1,105 @@
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Dict, List, Tuple
+
+from .decoder import BlockDecoder
+from .gateway import PRIORITY_LOW
+from .modbus_client import FC_READ_HOLDING_REGISTERS, FC_READ_INPUT_REGISTERS
+from .read_plan import MAX_READ_COUNT, ReadField, register_count
+
+# Klucz odczytu: (unit_id, kod funkcji, adres, liczba rejestrów).
+_ChunkKey = Tuple[int, int, int, int]
+
+
+def split_range(address: int, count: int, width: int = 1) -> List[Tuple[int, int]]:
+    """Dzieli zakres na odczyty po maks. 125 rejestrów, nie rozcinając wartości 32-bit."""
+    step = MAX_READ_COUNT - MAX_READ_COUNT % width
+    return [(a, min(step, address + count - a)) for a in range(address, address + count, step)]
+
+
+def decode_range(buf: Any, address: int, count: int, dtype: str, word_swap: bool = False) -> List[Any]:
+    """Dekoduje zakres rejestrów jako ciąg wartości `dtype` tym samym dekoderem co plan odczytu."""
+    width = register_count(dtype)
+    fields = [
+        ReadField(str(address + i), address + i, i, width, dtype, 1.0, None, word_swap)
+        for i in range(0, count - count % width, width)
+    ]
+    return [value for _, value in BlockDecoder(fields).decode(buf)] if fields else []
+
+
+class RegisterRangeReader:
+    """Odczyty dowolnych zakresów rejestrów przez kolejkę bramki, z krótką pamięcią wyników.
+
+    Zakres jest dzielony na odczyty zgodne z limitem protokołu; każdy idzie przez kolejkę
+    bramki z niskim priorytetem, więc nie koliduje z cyklicznym odpytywaniem i go nie opóźnia.
+    Wynik odczytu jest pamiętany przez `ttl` sekund, a równoczesne zapytania o ten sam
+    fragment czekają na jedną transakcję zamiast wysyłać własne.
+    """
+
+    def __init__(self, clients: Dict[int, Any], ttl: float) -> None:
+        self._clients = clients
+        self.ttl = ttl
+        # Klucz -> (czas monotoniczny odczytu, surowe bajty).
+        self._cache: Dict[_ChunkKey, Tuple[float, bytes]] = {}
+        self._pending: Dict[_ChunkKey, asyncio.Future] = {}
+        self.hits = 0
+        self.reads = 0
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def _purge(self, now: float) -> None:
+        for key in [k for k, (read_at, _) in self._cache.items() if now - read_at >= self.ttl]:
+            del self._cache[key]
+
+    async def async_read(
+        self, unit_id: int, input_type: str, address: int, count: int, width: int = 1, max_age: float | None = None
+    ) -> Tuple[bytes, int]:
+        """Zwraca (surowe bajty zakresu, liczba fragmentów z pamięci); wyjątki klienta przechodzą dalej.
+
+        `max_age` skraca dopuszczalny wiek wyniku z pamięci (0 = zawsze nowy odczyt).
+        """
+        function = FC_READ_HOLDING_REGISTERS if input_type == "holding" else FC_READ_INPUT_REGISTERS
+        ttl = self.ttl if max_age is None else min(max_age, self.ttl)
+        now = time.monotonic()
+        self._purge(now)
+        chunks = split_range(address, count, width)
+        parts = await asyncio.gather(
+            *(self._read_chunk((unit_id, function, a, n), ttl, now) for a, n in chunks)
+        )
+        return b"".join(data for data, _ in parts), sum(1 for _, cached in parts if cached)
+
+    async def _read_chunk(self, key: _ChunkKey, ttl: float, now: float) -> Tuple[bytes, bool]:
+        cached = self._cache.get(key)
+        # max_age=0 wymusza nowy odczyt; wynik i tak trafia do pamięci dla innych zapytań.
+        if cached is not None and now - cached[0] < ttl:
+            self.hits += 1
+            return cached[1], True
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending), True
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        unit_id, function, address, count = key
+        try:
+            regs = await self._clients[unit_id].read_registers(function, address, count, priority=PRIORITY_LOW)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as err:
+            future.set_exception(err)
+            # Wyjątek odbierają czekający; bez nich nie powinien trafić do logu jako nieodebrany.
+            future.exception()
+            raise
+        else:
+            data = bytes(regs)
+            self.reads += 1
+            self._cache[key] = (time.monotonic(), data)
+            future.set_result(data)
+            return data, False
+        finally:
+            del self._pending[key]
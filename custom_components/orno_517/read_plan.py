@@ -0,0 +1,117 @@
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Tuple
+
+from .decoder import BlockDecoder
+
+# Limit protokołu dla FC03/FC04 (125 rejestrów w jednej odpowiedzi).
+MAX_READ_COUNT = 125
+
+_REGISTER_COUNTS = {"uint16": 1, "int16": 1, "uint32": 2, "int32": 2, "float32": 2}
+
+
+def register_count(dtype: str) -> int:
+    return _REGISTER_COUNTS.get(dtype, 1)
+
+
+@dataclass
+class ReadField:
+    """Pojedyncza wartość w bloku: przesunięcie względem początku bloku + opis dekodowania."""
+
+    name: str
+    address: int
+    offset: int
+    count: int
+    dtype: str
+    scale: float
+    precision: int | None
+    word_swap: bool
+    # Indeks wartości w UnitSnapshot (slot z profilu).
+    slot: int = -1
+    deadband: float | None = None
+    deadband_pct: float | None = None
+    heartbeat: float | None = None
+
+
+@dataclass
+class ReadBlock:
+    """Jedno żądanie Modbus obejmujące kilka sąsiednich rejestrów."""
+
+    input_type: str
+    address: int
+    count: int
+    fallback: bool
+    fields: List[ReadField] = field(default_factory=list)
+    decoder: BlockDecoder | None = field(default=None, repr=False)
+
+    @property
+    def end(self) -> int:
+        return self.address + self.count
+
+
+def _field_from_def(d: Dict[str, Any]) -> Tuple[str, bool, ReadField]:
+    dtype: str = d.get("dtype") or d.get("data_type", "uint16")
+    precision = d.get("precision")
+    deadband = d.get("deadband")
+    deadband_pct = d.get("deadband_pct")
+    heartbeat = d.get("heartbeat")
+    return (
+        d.get("input_type", "holding"),
+        bool(d.get("fallback", True)),
+        ReadField(
+            name=d["name"],
+            address=int(d["address"]),
+            offset=0,
+            count=register_count(dtype),
+            dtype=dtype,
+            scale=float(d.get("scale", 1.0)),
+            precision=int(precision) if precision is not None else None,
+            word_swap=bool(d.get("word_swap", False)),
+            slot=int(d.get("slot", -1)),
+            deadband=float(deadband) if deadband is not None else None,
+            deadband_pct=float(deadband_pct) if deadband_pct is not None else None,
+            heartbeat=float(heartbeat) if heartbeat is not None else None,
+        ),
+    )
+
+
+def build_read_plan(
+    defs: Iterable[Dict[str, Any]],
+    max_gap: int = 0,
+    max_count: int = MAX_READ_COUNT,
+) -> List[ReadBlock]:
+    """Łączy definicje sensorów w jak najmniejszą liczbę odczytów blokowych.
+
+    Rejestry tego samego typu (input/holding) są scalane, jeśli przerwa między nimi
+    nie przekracza `max_gap` rejestrów, a cały blok mieści się w `max_count`.
+    Każdy blok dostaje skompilowany dekoder (`BlockDecoder`).
+    """
+    groups: Dict[Tuple[str, bool], List[ReadField]] = {}
+    for d in defs:
+        input_type, fallback, fld = _field_from_def(d)
+        groups.setdefault((input_type, fallback), []).append(fld)
+
+    plan: List[ReadBlock] = []
+    for (input_type, fallback), fields in groups.items():
+        fields.sort(key=lambda f: f.address)
+        block: ReadBlock | None = None
+        for fld in fields:
+            fld_end = fld.address + fld.count
+            if (
+                block is not None
+                and 0 <= fld.address - block.end <= max_gap
+                and max(block.end, fld_end) - block.address <= max_count
+            ):
+                block.count = max(block.end, fld_end) - block.address
+            else:
+                block = ReadBlock(input_type, fld.address, fld.count, fallback)
+                plan.append(block)
+            fld.offset = fld.address - block.address
+            block.fields.append(fld)
+
+    for block in plan:
+        block.decoder = BlockDecoder(block.fields)
+    plan.sort(key=lambda b: (b.input_type, b.address))
+    return plan
@@ -1,31 +1,42 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass, fields as dc_fields
-from typing import Any, Optional, List
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional, List
 
-from homeassistant.components.sensor import SensorEntity
-from homeassistant.core import HomeAssistant
+from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorStateClass
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory
 
-from .const import DOMAIN, SENSOR_DEFS
+from .const import DOMAIN
 from .coordinator import OrnoCoordinator
+from .profiles import DeviceProfile
+from .snapshot import ValueDescriptor
+from .stats import ClientStats
 
 
 @dataclass
-class OrnoSensorDesc:
+class OrnoDiagnosticDesc:
+    key: str
     name: str
-    address: int
-    unit: Optional[str] = None
-    data_type: str = "uint16"
-    scale: float = 1.0
-    precision: Optional[int] = None
-    input_type: str = "holding"
-    word_swap: bool = False
-    fallback: bool = True
+    unit: Optional[str]
+    value_fn: Callable[[OrnoCoordinator, ClientStats], Any]
+
+
+DIAGNOSTIC_SENSORS = [
+    OrnoDiagnosticDesc("poll_duration", "Czas ostatniego odczytu", "ms", lambda c, _: c.stats.last_duration_ms),
+    OrnoDiagnosticDesc("poll_requests", "Zapytania na odczyt", None, lambda c, _: c.stats.last_requests),
+    OrnoDiagnosticDesc("error_rate", "Odsetek błędów zapytań", "%", lambda c, _: c.stats.error_rate),
+    OrnoDiagnosticDesc("reconnects", "Ponowne połączenia", None, lambda _, cs: cs.reconnects),
+    OrnoDiagnosticDesc(
+        "poll_interval", "Interwał odczytu", "s", lambda c, _: round(c.update_interval.total_seconds(), 2)
+    ),
+]
 
 
 async def async_setup_entry(
@@ -36,41 +47,172 @@ async def async_setup_entry(
     data = hass.data[DOMAIN][entry.entry_id]
     coordinator: OrnoCoordinator = data["coordinator"]
 
-    allowed = {f.name for f in dc_fields(OrnoSensorDesc)}
-    entities: List[OrnoSensorEntity] = [
-        OrnoSensorEntity(
-            coordinator,
-            OrnoSensorDesc(**{k: v for k, v in s.items() if k in allowed}),
-            entry.entry_id,
-        )
-        for s in SENSOR_DEFS
+    # Wpis z jednym licznikiem zachowuje dotychczasowe unique_id i urządzenie;
+    # przy wielu jednostkach każda dostaje własne urządzenie.
+    unit_ids = list(coordinator.units)
+    multi = len(unit_ids) > 1
+    entities: List[SensorEntity] = [
+        OrnoSensorEntity(coordinator, desc, entry.entry_id, unit_id, multi)
+        for unit_id in unit_ids
+        for desc in coordinator.descriptors
     ]
+    client_stats: ClientStats = data["gateway"].client.stats
+    diag_device = _device_info(coordinator.profile, entry.entry_id, unit_ids[0] if multi else None)
+    entities.extend(
+        OrnoDiagnosticEntity(coordinator, desc, client_stats, entry.entry_id, diag_device)
+        for desc in DIAGNOSTIC_SENSORS
+    )
 
     async_add_entities(entities)
 
 
+def _device_info(profile: DeviceProfile, entry_id: str, unit_id: int | None = None) -> DeviceInfo:
+    if unit_id is None:
+        identifier, name = entry_id, profile.model
+    else:
+        identifier, name = f"{entry_id}_{unit_id}", f"{profile.model} (unit {unit_id})"
+    return DeviceInfo(
+        identifiers={(DOMAIN, identifier)},
+        name=name,
+        manufacturer=profile.manufacturer,
+        model=profile.model,
+    )
+
+
+def _enum_or_none(enum: Any, value: Optional[str]) -> Any:
+    try:
+        return enum(value) if value else None
+    except ValueError:
+        return None
+
+
 class OrnoSensorEntity(CoordinatorEntity[OrnoCoordinator], SensorEntity):
     _attr_has_entity_name = True
 
-    def __init__(self, coordinator: OrnoCoordinator, desc: OrnoSensorDesc, entry_id: str) -> None:
+    def __init__(
+        self,
+        coordinator: OrnoCoordinator,
+        desc: ValueDescriptor,
+        entry_id: str,
+        unit_id: int,
+        multi: bool = False,
+    ) -> None:
         super().__init__(coordinator)
         self._desc = desc
-        self._attr_unique_id = f"{entry_id}_{desc.address}"
+        self._unit_id = unit_id
+        self._slot = desc.slot
+        self._integer = desc.integer
+        self._key = (unit_id, desc.slot)
+        # W trybie okienkowym stan to średnia okna, a min/max/ostatnia wartość są atrybutami.
+        self._windowed = bool(coordinator.window_s) and desc.state_class == "measurement"
+        self._last_available: bool | None = None
+        self._last_restored: bool | None = None
+        suffix = desc.key or desc.address
+        if multi:
+            self._attr_unique_id = f"{entry_id}_u{unit_id}_{suffix}"
+        else:
+            self._attr_unique_id = f"{entry_id}_{suffix}"
         self._attr_name = desc.name
         self._attr_native_unit_of_measurement = desc.unit
+        self._attr_device_class = _enum_or_none(SensorDeviceClass, desc.device_class)
+        self._attr_state_class = _enum_or_none(SensorStateClass, desc.state_class)
         if desc.precision is not None:
             self._attr_suggested_display_precision = desc.precision
 
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, entry_id)},
-            name="OR-WE-517",
-            manufacturer="ORNO",
-            model="OR-WE-517",
+        self._attr_device_info = _device_info(coordinator.profile, entry_id, unit_id if multi else None)
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # Bloki odczytane w trakcie cyklu są publikowane od razu - tylko encjom zmienionych wartości.
+        self.async_on_remove(
+            self.coordinator.async_add_key_listener(self._key, self._handle_coordinator_update)
         )
 
+    @property
+    def available(self) -> bool:
+        return self.coordinator.unit_available(self._unit_id)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        # Zapisujemy stan tylko encji, których wartość zmieniła się w tym cyklu
+        # (poza martwą strefą / po heartbeat) albo gdy zmieniła się dostępność
+        # lub wartość przestała pochodzić z migawki.
+        available = self.available
+        restored = self.coordinator.units[self._unit_id].restored
+        if (
+            available == self._last_available
+            and restored == self._last_restored
+            and self._key not in self.coordinator.updated_keys
+        ):
+            return
+        self._last_available = available
+        self._last_restored = restored
+        self.async_write_ha_state()
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        unit = self.coordinator.units[self._unit_id]
+        attrs: dict[str, Any] = {}
+        if unit.restored:
+            snap = (self.coordinator.data or {}).get(self._unit_id)
+            if snap is not None and snap.read_at is not None:
+                # Wartość z migawki sprzed restartu - do pierwszego udanego odczytu.
+                attrs["restored_from"] = datetime.fromtimestamp(snap.read_at, timezone.utc).isoformat()
+        elif self._windowed:
+            attrs.update(self.coordinator.window_attributes(self._unit_id, self._slot) or {})
+        if unit.stale[self._slot]:
+            # Ostatni odczyt bloku nie udał się lub nie zdążył przed terminem cyklu.
+            attrs["stale"] = True
+        return attrs or None
+
+    @property
+    def native_value(self) -> Any:
+        snap = (self.coordinator.data or {}).get(self._unit_id)
+        if snap is None:
+            return None
+        value = snap.get(self._slot)
+        if value is not None and self._integer:
+            return int(value)
+        return value
+
+
+class OrnoDiagnosticEntity(CoordinatorEntity[OrnoCoordinator], SensorEntity):
+    """Statystyki ścieżki odczytu; domyślnie wyłączone."""
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self,
+        coordinator: OrnoCoordinator,
+        desc: OrnoDiagnosticDesc,
+        client_stats: ClientStats,
+        entry_id: str,
+        device_info: DeviceInfo,
+    ) -> None:
+        super().__init__(coordinator)
+        self._desc = desc
+        self._client_stats = client_stats
+        self._last_value: Any = None
+        self._attr_unique_id = f"{entry_id}_diag_{desc.key}"
+        self._attr_name = desc.name
+        self._attr_native_unit_of_measurement = desc.unit
+        self._attr_device_info = device_info
+
+    @property
+    def available(self) -> bool:
+        # Diagnostyka ma sens właśnie wtedy, gdy odczyty się nie udają.
+        return True
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        value = self.native_value
+        if value == self._last_value:
+            return
+        self._last_value = value
+        self.async_write_ha_state()
+
     @property
     def native_value(self) -> Any:
-        data = self.coordinator.data or {}
-        if self._desc.name in data:
-            return data[self._desc.name]
-        return data.get(str(self._desc.address))
+        return self._desc.value_fn(self.coordinator, self._client_stats)
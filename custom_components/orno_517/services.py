@@ -0,0 +1,214 @@
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List
+
+import voluptuous as vol
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+
+from .burst import event_data, select_defs
+from .capture import FrameCapture
+from .modbus_client import ModbusError
+from .range_reader import decode_range
+from .read_plan import register_count
+from .const import (
+    DOMAIN,
+    SERVICE_RESET_REGISTER_CACHE,
+    SERVICE_BURST_SAMPLE,
+    SERVICE_START_CAPTURE,
+    SERVICE_SAVE_CAPTURE,
+    SERVICE_READ_REGISTERS,
+    EVENT_BURST,
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_UNIT_ID,
+    ATTR_REGISTERS,
+    ATTR_DURATION,
+    ATTR_MAX_SIZE,
+    ATTR_STOP,
+    ATTR_INPUT_TYPE,
+    ATTR_ADDRESS,
+    ATTR_COUNT,
+    ATTR_DTYPE,
+    ATTR_WORD_SWAP,
+    ATTR_MAX_AGE,
+    BURST_DEFAULT_REGISTERS,
+    BURST_DEFAULT_DURATION_S,
+    BURST_MAX_DURATION_S,
+    CAPTURE_DEFAULT_SIZE_KB,
+    CAPTURE_MAX_SIZE_KB,
+    READ_REGISTERS_MAX_COUNT,
+    READ_REGISTERS_TTL_S,
+    MIN_UNIT_ID,
+    MAX_UNIT_ID,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+RESET_REGISTER_CACHE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_CONFIG_ENTRY_ID): str,
+})
+
+BURST_SAMPLE_SCHEMA = vol.Schema({
+    vol.Required(ATTR_CONFIG_ENTRY_ID): str,
+    vol.Optional(ATTR_UNIT_ID): vol.All(vol.Coerce(int), vol.Range(min=MIN_UNIT_ID, max=MAX_UNIT_ID)),
+    vol.Optional(ATTR_REGISTERS): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(ATTR_DURATION, default=BURST_DEFAULT_DURATION_S): vol.All(
+        vol.Coerce(float), vol.Range(min=1, max=BURST_MAX_DURATION_S)
+    ),
+})
+
+START_CAPTURE_SCHEMA = vol.Schema({
+    vol.Required(ATTR_CONFIG_ENTRY_ID): str,
+    vol.Optional(ATTR_MAX_SIZE, default=CAPTURE_DEFAULT_SIZE_KB): vol.All(
+        vol.Coerce(int), vol.Range(min=1, max=CAPTURE_MAX_SIZE_KB)
+    ),
+})
+
+SAVE_CAPTURE_SCHEMA = vol.Schema({
+    vol.Required(ATTR_CONFIG_ENTRY_ID): str,
+    vol.Optional(ATTR_STOP, default=True): cv.boolean,
+})
+
+READ_REGISTERS_SCHEMA = vol.Schema({
+    vol.Required(ATTR_CONFIG_ENTRY_ID): str,
+    vol.Optional(ATTR_UNIT_ID): vol.All(vol.Coerce(int), vol.Range(min=MIN_UNIT_ID, max=MAX_UNIT_ID)),
+    vol.Optional(ATTR_INPUT_TYPE, default="holding"): vol.In(("holding", "input")),
+    vol.Required(ATTR_ADDRESS): vol.All(vol.Coerce(int), vol.Range(min=0, max=0xFFFF)),
+    vol.Optional(ATTR_COUNT, default=1): vol.All(vol.Coerce(int), vol.Range(min=1, max=READ_REGISTERS_MAX_COUNT)),
+    vol.Optional(ATTR_DTYPE, default="uint16"): vol.In(("uint16", "int16", "uint32", "int32", "float32")),
+    vol.Optional(ATTR_WORD_SWAP, default=False): cv.boolean,
+    vol.Optional(ATTR_MAX_AGE): vol.All(vol.Coerce(float), vol.Range(min=0, max=READ_REGISTERS_TTL_S)),
+})
+
+
+def _entries(hass: HomeAssistant, call: ServiceCall) -> List[Dict[str, Any]]:
+    """Dane wpisów wskazanych w wywołaniu (lub wszystkich, gdy nie podano config_entry_id)."""
+    loaded: Dict[str, Dict[str, Any]] = hass.data.get(DOMAIN, {})
+    entry_id = call.data.get(ATTR_CONFIG_ENTRY_ID)
+    if entry_id is None:
+        return list(loaded.values())
+    if entry_id not in loaded:
+        raise ServiceValidationError(f"Nieznany lub niezaładowany wpis ORNO: {entry_id}")
+    return [loaded[entry_id]]
+
+
+async def async_setup_services(hass: HomeAssistant) -> None:
+    async def _reset_register_cache(call: ServiceCall) -> None:
+        for data in _entries(hass, call):
+            await data["register_cache"].async_reset()
+        _LOGGER.info("ORNO: wyczyszczono nauczone typy rejestrów")
+
+    async def _burst_sample(call: ServiceCall) -> ServiceResponse:
+        data = _entries(hass, call)[0]
+        coordinator = data["coordinator"]
+        unit_id = call.data.get(ATTR_UNIT_ID, next(iter(coordinator.units)))
+        if unit_id not in coordinator.units:
+            raise ServiceValidationError(f"Wpis nie obsługuje jednostki {unit_id}")
+        if coordinator.burst_active:
+            raise ServiceValidationError("Próbkowanie seryjne dla tego wpisu już trwa")
+        registers = call.data.get(ATTR_REGISTERS)
+        if registers is None:
+            # Domyślny zestaw zależy od profilu (np. licznik 1-fazowy ma tylko "Prąd").
+            available = {d["name"] for d in coordinator.profile.defs}
+            registers = [name for name in BURST_DEFAULT_REGISTERS if name in available]
+        try:
+            # Seria czyta rejestry bezpośrednio, także te liczone lokalnie w trybie wartości pochodnych.
+            defs = select_defs(coordinator.profile.defs, registers)
+        except ValueError as err:
+            raise ServiceValidationError(f"Nieznany rejestr: {err}") from err
+        if not defs:
+            raise ServiceValidationError("Nie wybrano żadnego rejestru")
+
+        result = await coordinator.async_burst(unit_id, defs, call.data[ATTR_DURATION])
+        result[ATTR_CONFIG_ENTRY_ID] = call.data[ATTR_CONFIG_ENTRY_ID]
+        # Zdarzenie niesie tylko podsumowanie - surowe serie są w odpowiedzi usługi.
+        hass.bus.async_fire(EVENT_BURST, event_data(result))
+        # Zwykły harmonogram: od razu odczyt klas, które stały się należne w trakcie serii.
+        await coordinator.async_request_refresh()
+        return result if call.return_response else None
+
+    async def _start_capture(call: ServiceCall) -> None:
+        client = _entries(hass, call)[0]["gateway"].client
+        if client.capture is not None:
+            raise ServiceValidationError("Nagrywanie ramek na tej bramce już trwa")
+        # Nagranie dotyczy połączenia, więc obejmuje wszystkie wpisy korzystające z tej bramki.
+        client.capture = FrameCapture(client.framing, call.data[ATTR_MAX_SIZE] * 1024)
+        _LOGGER.info("ORNO: nagrywanie ramek włączone (limit %s KiB)", call.data[ATTR_MAX_SIZE])
+
+    async def _save_capture(call: ServiceCall) -> ServiceResponse:
+        entry_id = call.data[ATTR_CONFIG_ENTRY_ID]
+        client = _entries(hass, call)[0]["gateway"].client
+        capture = client.capture
+        if capture is None:
+            raise ServiceValidationError("Nagrywanie ramek nie jest włączone")
+        if call.data[ATTR_STOP]:
+            client.capture = None
+        path = hass.config.path(f"{DOMAIN}_{entry_id}_{time.strftime('%Y%m%d_%H%M%S')}.cap")
+        size = await hass.async_add_executor_job(capture.write, path)
+        _LOGGER.info("ORNO: zapisano %s ramek (%s B) do %s", capture.frames, size, path)
+        result = {"path": path, "size": size, **capture.as_dict()}
+        return result if call.return_response else None
+
+    async def _read_registers(call: ServiceCall) -> ServiceResponse:
+        data = _entries(hass, call)[0]
+        coordinator = data["coordinator"]
+        unit_id = call.data.get(ATTR_UNIT_ID, next(iter(coordinator.units)))
+        if unit_id not in coordinator.units:
+            raise ServiceValidationError(f"Wpis nie obsługuje jednostki {unit_id}")
+        address, count, dtype = call.data[ATTR_ADDRESS], call.data[ATTR_COUNT], call.data[ATTR_DTYPE]
+        if address + count > 0x10000:
+            raise ServiceValidationError("Zakres wykracza poza przestrzeń adresową Modbus")
+        width = register_count(dtype)
+        if count % width:
+            raise ServiceValidationError(f"Liczba rejestrów musi być wielokrotnością {width} dla typu {dtype}")
+        try:
+            regs, cached = await data["range_reader"].async_read(
+                unit_id, call.data[ATTR_INPUT_TYPE], address, count, width, call.data.get(ATTR_MAX_AGE)
+            )
+        except (ModbusError, OSError, asyncio.TimeoutError) as err:
+            raise HomeAssistantError(
+                f"Odczyt rejestrów {address}+{count} nie powiódł się: {str(err) or type(err).__name__}"
+            ) from err
+        return {
+            ATTR_UNIT_ID: unit_id,
+            ATTR_INPUT_TYPE: call.data[ATTR_INPUT_TYPE],
+            ATTR_ADDRESS: address,
+            ATTR_COUNT: count,
+            ATTR_DTYPE: dtype,
+            "cached_chunks": cached,
+            "registers": [int.from_bytes(regs[i:i + 2], "big") for i in range(0, len(regs), 2)],
+            "values": decode_range(regs, address, count, dtype, call.data[ATTR_WORD_SWAP]),
+        }
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_RESET_REGISTER_CACHE, _reset_register_cache, schema=RESET_REGISTER_CACHE_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BURST_SAMPLE,
+        _burst_sample,
+        schema=BURST_SAMPLE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_START_CAPTURE, _start_capture, schema=START_CAPTURE_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SAVE_CAPTURE,
+        _save_capture,
+        schema=SAVE_CAPTURE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_READ_REGISTERS,
+        _read_registers,
+        schema=READ_REGISTERS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
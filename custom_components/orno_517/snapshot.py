@@ -0,0 +1,90 @@
+
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+
+@dataclass(frozen=True, slots=True)
+class ValueDescriptor:
+    """Niezmienny opis jednej wartości profilu (rejestru lub wartości pochodnej).
+
+    `slot` to stały indeks wartości w `UnitSnapshot` - encje i dekodery odwołują się
+    do niego zamiast do nazw, więc odczyt stanu nie wymaga haszowania kluczy.
+    """
+
+    slot: int
+    name: str
+    address: Optional[int] = None
+    key: Optional[str] = None
+    unit: Optional[str] = None
+    device_class: Optional[str] = None
+    state_class: Optional[str] = None
+    precision: Optional[int] = None
+    # Typ całkowity bez skali - wartość wraca do encji jako int.
+    integer: bool = False
+
+    @classmethod
+    def from_def(cls, d: Dict[str, Any]) -> "ValueDescriptor":
+        dtype = d.get("dtype") or d.get("data_type")
+        precision = d.get("precision")
+        return cls(
+            slot=d["slot"],
+            name=d["name"],
+            address=d.get("address"),
+            key=d.get("key"),
+            unit=d.get("unit"),
+            device_class=d.get("device_class"),
+            state_class=d.get("state_class"),
+            precision=int(precision) if precision is not None else None,
+            integer=dtype is not None and dtype != "float32" and float(d.get("scale", 1.0)) == 1.0,
+        )
+
+
+class UnitSnapshot:
+    """Wartości jednej jednostki: tablica `array('d')` indeksowana slotem + mapa ważności.
+
+    Mapa ważności ma jeden bajt na slot (a nie jeden bit) - przesunięcia i maski bitowe
+    podwajały w CPythonie koszt `get`/`set`, a oszczędność to kilkadziesiąt bajtów.
+    Cykl koordynatora kopiuje migawkę przy pierwszym zapisie (kopiowanie dwóch buforów);
+    bloki są publikowane, gdy dotrą, więc w trakcie cyklu encje widzą stan po zakończonych
+    blokach (każdy blok w całości), a opublikowana migawka spoza cyklu nie jest zmieniana
+    w miejscu. `read_at` to czas (unix) ostatniego zapisu.
+    """
+
+    __slots__ = ("values", "valid", "read_at")
+
+    def __init__(self, size: int) -> None:
+        self.values = array("d", bytes(8 * size))
+        self.valid = bytearray(size)
+        self.read_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def copy(self) -> "UnitSnapshot":
+        other = UnitSnapshot.__new__(UnitSnapshot)
+        other.values = array("d", self.values)
+        other.valid = bytearray(self.valid)
+        other.read_at = self.read_at
+        return other
+
+    def get(self, slot: int) -> float | None:
+        return self.values[slot] if self.valid[slot] else None
+
+    def set(self, slot: int, value: float) -> None:
+        self.values[slot] = value
+        self.valid[slot] = 1
+
+    def count(self) -> int:
+        return self.valid.count(1)
+
+    def as_dict(self, descriptors: Iterable[ValueDescriptor]) -> Dict[str, Any]:
+        """{nazwa: wartość} ważnych slotów (diagnostyka, migawka na dysku)."""
+        out: Dict[str, Any] = {}
+        for desc in descriptors:
+            value = self.get(desc.slot)
+            if value is not None:
+                out[desc.name] = int(value) if desc.integer else value
+        return out
@@ -0,0 +1,124 @@
+
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+# Górne granice kubełków histogramu [ms]; ostatni kubełek zbiera wszystko powyżej.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class LatencyHistogram:
+    """Histogram o stałych kubełkach - stały koszt aktualizacji, bez przechowywania próbek."""
+
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        index = 0
+        for bound in LATENCY_BUCKETS_MS:
+            if ms <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, pct: float) -> float | None:
+        """Górna granica kubełka, w którym leży dany percentyl (przybliżenie)."""
+        if not self.count:
+            return None
+        target = self.count * pct / 100
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return float(LATENCY_BUCKETS_MS[index]) if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 3),
+            "buckets_ms": dict(zip([*map(str, LATENCY_BUCKETS_MS), "inf"], self.counts)),
+        }
+
+
+class ClientStats:
+    """Liczniki transportu Modbus (współdzielone przez wszystkie wpisy na danej bramce)."""
+
+    __slots__ = (
+        "requests", "timeouts", "device_errors", "transport_errors", "orphans",
+        "connects", "bytes_sent", "bytes_received", "rtt",
+    )
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.timeouts = 0
+        self.device_errors = 0
+        self.transport_errors = 0
+        self.orphans = 0
+        self.connects = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.rtt = LatencyHistogram()
+
+    @property
+    def reconnects(self) -> int:
+        return max(0, self.connects - 1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = {name: getattr(self, name) for name in self.__slots__ if name != "rtt"}
+        data["reconnects"] = self.reconnects
+        data["rtt"] = self.rtt.as_dict()
+        return data
+
+
+class PollStats:
+    """Statystyki cykli koordynatora: czas cyklu, zapytania, błędy, fallbacki, dekodowanie."""
+
+    __slots__ = (
+        "polls", "failed_polls", "requests", "request_errors", "fallbacks", "late_blocks",
+        "last_duration_ms", "last_requests", "last_errors", "last_decode_ms",
+        "duration", "decode",
+    )
+
+    def __init__(self) -> None:
+        self.polls = 0
+        self.failed_polls = 0
+        self.requests = 0
+        self.request_errors = 0
+        self.fallbacks = 0
+        # Bloki, które nie zmieściły się w terminie cyklu (publikowane po nadejściu odpowiedzi).
+        self.late_blocks = 0
+        self.last_duration_ms: float | None = None
+        self.last_requests = 0
+        self.last_errors = 0
+        self.last_decode_ms = 0.0
+        self.duration = LatencyHistogram()
+        self.decode = LatencyHistogram()
+
+    @property
+    def error_rate(self) -> float:
+        """Odsetek zapytań zakończonych błędem (od startu), w %."""
+        return round(100 * self.request_errors / self.requests, 2) if self.requests else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = {
+            name: getattr(self, name)
+            for name in self.__slots__
+            if name not in ("duration", "decode")
+        }
+        data["error_rate_pct"] = self.error_rate
+        data["duration"] = self.duration.as_dict()
+        data["decode"] = self.decode.as_dict()
+        return data
@@ -0,0 +1,145 @@
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Callable, Dict
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, REGISTER_CACHE_REPROBE_S, SNAPSHOT_SAVE_INTERVAL_S
+from .read_plan import ReadBlock
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+# Zapis jest odkładany, żeby kilka nauczonych bloków w jednym cyklu dało jeden zapis na dysk.
+_SAVE_DELAY = 10
+
+
+def _register_key(unit: int, address: int) -> str:
+    return f"{unit}:{address}"
+
+
+class RegisterTypeCache:
+    """Zapamiętany kod funkcji (input/holding), na który faktycznie odpowiadają rejestry jednostki.
+
+    Klucz to (jednostka, adres rejestru), a nie kształt bloku - bloki składane z różnych
+    kombinacji należnych klas częstotliwości korzystają z tej samej wiedzy. Dzięki temu
+    fallback input->holding kosztuje jeden dodatkowy odczyt na instalację, a nie na każdy
+    cykl. Co `reprobe_s` sekund wiedza jest odrzucana i rejestry są sprawdzane ponownie
+    od skonfigurowanego typu.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, reprobe_s: float = REGISTER_CACHE_REPROBE_S) -> None:
+        self._store: Store[Dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.register_types"
+        )
+        self._reprobe_s = reprobe_s
+        self._types: Dict[str, str] = {}
+        self._learned_at: float = time.time()
+
+    async def async_load(self) -> None:
+        data = await self._store.async_load()
+        if not data:
+            return
+        # Klucze starszego formatu (kształt bloku) są pomijane - typ zostanie nauczony ponownie.
+        self._types = {
+            key: kind for key, kind in data.get("types", {}).items()
+            if key.count(":") == 1 and key.replace(":", "").isdigit()
+        }
+        self._learned_at = float(data.get("learned_at", time.time()))
+        _LOGGER.debug("ORNO: wczytano %s nauczonych typów rejestrów", len(self._types))
+
+    def _data(self) -> Dict[str, Any]:
+        return {"types": self._types, "learned_at": self._learned_at}
+
+    def _save(self) -> None:
+        self._store.async_delay_save(self._data, _SAVE_DELAY)
+
+    def get(self, block: ReadBlock, unit: int) -> str | None:
+        """Nauczony typ bloku: typ pierwszego jego rejestru, który go ma."""
+        types = self._types
+        if not types:
+            return None
+        if time.time() - self._learned_at > self._reprobe_s:
+            _LOGGER.debug("ORNO: ponowne sprawdzanie typów rejestrów")
+            self._types = {}
+            self._learned_at = time.time()
+            self._save()
+            return None
+        for fld in block.fields:
+            kind = types.get(_register_key(unit, fld.address))
+            if kind is not None:
+                return kind
+        return None
+
+    def learn(self, block: ReadBlock, kind: str, unit: int) -> None:
+        """Zapamiętuje typ, na który odpowiedział blok, dla każdego z jego rejestrów."""
+        types = self._types
+        keys = [_register_key(unit, fld.address) for fld in block.fields]
+        if kind == block.input_type:
+            # Typ zgodny z profilem nie jest zapamiętywany.
+            if not types or not any([types.pop(key, None) for key in keys]):
+                return
+        else:
+            if all(types.get(key) == kind for key in keys):
+                return
+            if not types:
+                self._learned_at = time.time()
+            for key in keys:
+                types[key] = kind
+            _LOGGER.info(
+                "ORNO: unit %s, rejestry %s+%s odpowiadają jako %s", unit, block.address, block.count, kind
+            )
+        self._save()
+
+    @property
+    def types(self) -> Dict[str, str]:
+        return dict(self._types)
+
+    async def async_reset(self) -> None:
+        self._types = {}
+        self._learned_at = time.time()
+        await self._store.async_save(self._data())
+
+    async def async_remove(self) -> None:
+        await self._store.async_remove()
+
+
+class ValueSnapshot:
+    """Ostatnie odczytane wartości wpisu, przywracane przy starcie zanim ruszy pierwszy odczyt.
+
+    Format: {"units": {"<unit_id>": {"read_at": <unix ts>, "values": {nazwa: wartość}}}}.
+    Zapis jest odkładany (`async_delay_save`), a dane są pobierane dopiero w chwili zapisu.
+    Każde wywołanie `schedule_save` od nowa odlicza opóźnienie, więc wywołujący planuje zapis
+    najwyżej raz na `SNAPSHOT_SAVE_INTERVAL_S`. Store zapisuje oczekujące dane również przy
+    zatrzymaniu Home Assistant.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        self._store: Store[Dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.snapshot"
+        )
+
+    async def async_load(self) -> Dict[int, Dict[str, Any]]:
+        data = await self._store.async_load()
+        if not data:
+            return {}
+        units: Dict[int, Dict[str, Any]] = {}
+        for unit_id, unit in (data.get("units") or {}).items():
+            try:
+                units[int(unit_id)] = {
+                    "read_at": float(unit["read_at"]),
+                    "values": dict(unit["values"]),
+                }
+            except (KeyError, TypeError, ValueError):
+                _LOGGER.debug("ORNO: pomijam uszkodzoną migawkę jednostki %s", unit_id)
+        return units
+
+    def schedule_save(self, data_func: Callable[[], Dict[str, Any]]) -> None:
+        self._store.async_delay_save(data_func, SNAPSHOT_SAVE_INTERVAL_S)
+
+    async def async_remove(self) -> None:
+        await self._store.async_remove()
@@ -1,9 +0,0 @@
-"""Stałe dla integracji ORNO 517."""
-DOMAIN = "orno_517"
-CONF_HOST = "host"
-CONF_PORT = "port"
-CONF_SLAVE = "slave"
-CONF_SCAN_INTERVAL = "scan_interval"
-CONF_DEVICE_NAME = "device_name"
-
-PLATFORMS = ["sensor"]
@@ -0,0 +1,200 @@
+
+from __future__ import annotations
+
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Sequence
+
+import voluptuous as vol
+from homeassistant.components import websocket_api
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    DOMAIN,
+    WS_SUBSCRIBE_SAMPLES,
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_UNIT_ID,
+    ATTR_REGISTERS,
+    ATTR_BATCH_INTERVAL,
+    ATTR_MAX_FRAMES,
+    SAMPLES_DEFAULT_INTERVAL_S,
+    SAMPLES_MAX_INTERVAL_S,
+    SAMPLES_DEFAULT_MAX_FRAMES,
+    SAMPLES_MAX_FRAMES,
+    MIN_UNIT_ID,
+    MAX_UNIT_ID,
+)
+from .snapshot import UnitSnapshot, ValueDescriptor
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@callback
+def async_setup_websocket(hass: HomeAssistant) -> None:
+    websocket_api.async_register_command(hass, ws_subscribe_samples)
+
+
+def select_descriptors(
+    descriptors: Sequence[ValueDescriptor], registers: Sequence[Any]
+) -> List[ValueDescriptor]:
+    """Wybiera wartości po nazwie, kluczu wartości pochodnej lub adresie; ValueError dla nieznanych."""
+    by_key: Dict[str, ValueDescriptor] = {}
+    for desc in descriptors:
+        by_key[desc.name] = desc
+        if desc.key is not None:
+            by_key[desc.key] = desc
+        if desc.address is not None:
+            by_key[str(desc.address)] = desc
+    selected: List[ValueDescriptor] = []
+    for reg in registers:
+        key = str(reg).strip()
+        desc = by_key.get(key)
+        if desc is None:
+            try:
+                desc = by_key.get(str(int(key, 0)))
+            except ValueError:
+                pass
+        if desc is None:
+            raise ValueError(reg)
+        if desc not in selected:
+            selected.append(desc)
+    return selected
+
+
+class SampleSubscription:
+    """Paczkowanie próbek jednej subskrypcji websocket.
+
+    Każdy cykl koordynatora dodaje po jednej ramce na jednostkę: `[czas, unit_id, v1, v2, ...]`
+    w kolejności rejestrów z nagłówka (`null`, gdy wartość nie była odczytana w tym cyklu).
+    Ramki są wysyłane paczką co `interval` sekund, więc liczba wiadomości nie zależy od
+    częstości odpytywania, a wolny odbiorca nie zapycha kolejki połączenia. Bufor ramek ma
+    stały limit: gdy między wysyłkami przybywa ich więcej, najstarsze są odrzucane, a ich
+    liczba trafia do pola `dropped` paczki.
+    """
+
+    __slots__ = ("_hass", "_send", "_units", "_slots", "_interval", "_frames", "_dropped", "_timer")
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        send: Callable[[Dict[str, Any]], None],
+        units: Sequence[int],
+        slots: Sequence[int],
+        interval: float,
+        max_frames: int,
+    ) -> None:
+        self._hass = hass
+        self._send = send
+        self._units = list(units)
+        self._slots = list(slots)
+        self._interval = interval
+        self._frames: Deque[List[Any]] = deque(maxlen=max_frames)
+        self._dropped = 0
+        self._timer: CALLBACK_TYPE | None = None
+
+    @callback
+    def add(self, read_at: float, samples: Dict[int, UnitSnapshot]) -> None:
+        frames = self._frames
+        for unit_id in self._units:
+            snap = samples.get(unit_id)
+            if snap is None:
+                continue
+            row = [snap.get(slot) for slot in self._slots]
+            if all(v is None for v in row):
+                continue
+            if len(frames) == frames.maxlen:
+                self._dropped += 1
+            frames.append([round(read_at, 3), unit_id, *row])
+        if not frames or self._timer is not None:
+            return
+        if self._interval:
+            self._timer = async_call_later(self._hass, self._interval, self._flush)
+        else:
+            self._flush()
+
+    @callback
+    def _flush(self, _now: Any = None) -> None:
+        self._timer = None
+        if not self._frames:
+            return
+        batch: Dict[str, Any] = {"frames": list(self._frames)}
+        if self._dropped:
+            batch["dropped"] = self._dropped
+            self._dropped = 0
+        self._frames.clear()
+        self._send(batch)
+
+    @callback
+    def cancel(self) -> None:
+        if self._timer is not None:
+            self._timer()
+            self._timer = None
+        self._frames.clear()
+
+
+@websocket_api.websocket_command({
+    vol.Required("type"): WS_SUBSCRIBE_SAMPLES,
+    vol.Required(ATTR_CONFIG_ENTRY_ID): str,
+    vol.Optional(ATTR_UNIT_ID): vol.All(vol.Coerce(int), vol.Range(min=MIN_UNIT_ID, max=MAX_UNIT_ID)),
+    vol.Optional(ATTR_REGISTERS): [vol.Any(str, int)],
+    vol.Optional(ATTR_BATCH_INTERVAL, default=SAMPLES_DEFAULT_INTERVAL_S): vol.All(
+        vol.Coerce(float), vol.Range(min=0, max=SAMPLES_MAX_INTERVAL_S)
+    ),
+    vol.Optional(ATTR_MAX_FRAMES, default=SAMPLES_DEFAULT_MAX_FRAMES): vol.All(
+        vol.Coerce(int), vol.Range(min=1, max=SAMPLES_MAX_FRAMES)
+    ),
+})
+@callback
+def ws_subscribe_samples(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: Dict[str, Any]
+) -> None:
+    """Subskrypcja surowych próbek licznika prosto z dekodera koordynatora.
+
+    Pierwsza wiadomość po potwierdzeniu to nagłówek (`registers`, `units`), kolejne to paczki
+    ramek. Próbki nie przechodzą przez encje, maszynę stanów ani szynę zdarzeń.
+    """
+    data = hass.data.get(DOMAIN, {}).get(msg[ATTR_CONFIG_ENTRY_ID])
+    if data is None:
+        connection.send_error(
+            msg["id"], websocket_api.ERR_NOT_FOUND, f"Nieznany lub niezaładowany wpis ORNO: {msg[ATTR_CONFIG_ENTRY_ID]}"
+        )
+        return
+    coordinator = data["coordinator"]
+    units = list(coordinator.units)
+    if ATTR_UNIT_ID in msg:
+        if msg[ATTR_UNIT_ID] not in coordinator.units:
+            connection.send_error(
+                msg["id"], websocket_api.ERR_INVALID_FORMAT, f"Wpis nie obsługuje jednostki {msg[ATTR_UNIT_ID]}"
+            )
+            return
+        units = [msg[ATTR_UNIT_ID]]
+    try:
+        descriptors = select_descriptors(coordinator.descriptors, msg.get(ATTR_REGISTERS) or [])
+    except ValueError as err:
+        connection.send_error(msg["id"], websocket_api.ERR_INVALID_FORMAT, f"Nieznany rejestr: {err}")
+        return
+    if not descriptors:
+        descriptors = list(coordinator.descriptors)
+
+    msg_id = msg["id"]
+
+    @callback
+    def send(payload: Dict[str, Any]) -> None:
+        connection.send_message(websocket_api.event_message(msg_id, payload))
+
+    subscription = SampleSubscription(
+        hass, send, units, [desc.slot for desc in descriptors], msg[ATTR_BATCH_INTERVAL], msg[ATTR_MAX_FRAMES]
+    )
+    remove_listener = coordinator.async_add_sample_listener(subscription.add)
+
+    @callback
+    def unsubscribe() -> None:
+        remove_listener()
+        subscription.cancel()
+        _LOGGER.debug("ORNO: koniec subskrypcji próbek %s", msg_id)
+
+    connection.subscriptions[msg_id] = unsubscribe
+    connection.send_result(msg_id)
+    send({"registers": [desc.name for desc in descriptors], "units": units})
+    _LOGGER.debug("ORNO: subskrypcja próbek %s: %s rejestrów, jednostki %s", msg_id, len(descriptors), units)
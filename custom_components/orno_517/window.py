@@ -0,0 +1,140 @@
+
+from __future__ import annotations
+
+import logging
+import math
+import re
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable
+
+from .snapshot import UnitSnapshot, ValueDescriptor
+
+_LOGGER = logging.getLogger(__name__)
+
+HOUR_S = 3600
+
+
+class WindowStats:
+    """Agregaty próbek jednego okna dla wszystkich slotów jednostki.
+
+    Pięć prealokowanych tablic o stałym rozmiarze (liczba slotów profilu): min, max,
+    suma, liczba próbek i ostatnia wartość. Próbka to kilka zapisów do tablic, a pamięć
+    nie rośnie z długością okna ani częstotliwością próbkowania. Okna godzinowe dla
+    statystyk długoterminowych powstają przez `merge` okien krótszych.
+    """
+
+    __slots__ = ("start", "min", "max", "sum", "count", "last")
+
+    def __init__(self, size: int, start: float) -> None:
+        self.start = start
+        self.min = array("d", [math.inf]) * size
+        self.max = array("d", [-math.inf]) * size
+        self.sum = array("d", bytes(8 * size))
+        self.count = array("L", [0]) * size
+        self.last = array("d", bytes(8 * size))
+
+    @property
+    def samples(self) -> int:
+        return max(self.count, default=0)
+
+    def add(self, snap: UnitSnapshot, mask: bytearray | None = None) -> None:
+        """Dopisuje ważne wartości migawki (albo tylko sloty z `mask`) jako jedną próbkę."""
+        values = snap.values
+        lo, hi, total, count, last = self.min, self.max, self.sum, self.count, self.last
+        for slot, ok in enumerate(snap.valid if mask is None else mask):
+            if not ok:
+                continue
+            value = values[slot]
+            if value < lo[slot]:
+                lo[slot] = value
+            if value > hi[slot]:
+                hi[slot] = value
+            total[slot] += value
+            count[slot] += 1
+            last[slot] = value
+
+    def merge(self, other: "WindowStats") -> None:
+        for slot, n in enumerate(other.count):
+            if not n:
+                continue
+            self.min[slot] = min(self.min[slot], other.min[slot])
+            self.max[slot] = max(self.max[slot], other.max[slot])
+            self.sum[slot] += other.sum[slot]
+            self.count[slot] += n
+            self.last[slot] = other.last[slot]
+
+    def mean(self, slot: int) -> float | None:
+        n = self.count[slot]
+        return self.sum[slot] / n if n else None
+
+    def summary(self, slot: int) -> Dict[str, Any] | None:
+        """Atrybuty encji dla slotu: min/max/ostatnia wartość okna i liczba próbek."""
+        n = self.count[slot]
+        if not n:
+            return None
+        return {
+            "min": self.min[slot],
+            "max": self.max[slot],
+            "last": self.last[slot],
+            "samples": n,
+            "window_start": datetime.fromtimestamp(self.start, timezone.utc).isoformat(),
+        }
+
+
+def statistic_id(prefix: str, suffix: Any) -> str:
+    """Identyfikator statystyki zewnętrznej `orno_517:<obiekt>` (małe litery, cyfry, `_`)."""
+    domain, _, obj = prefix.partition(":")
+    obj = re.sub(r"[^a-z0-9]+", "_", f"{obj}_{suffix}".lower()).strip("_")
+    return f"{domain}:{obj}"
+
+
+def add_hour_statistics(
+    hass: Any,
+    prefix: str,
+    name: str,
+    descriptors: Iterable[ValueDescriptor],
+    hour: WindowStats,
+    unit_key: str = "",
+) -> int:
+    """Zapisuje min/max/średnią bieżącej godziny jako statystyki długoterminowe HA.
+
+    Wywoływane po każdym oknie: rekord godziny jest nadpisywany, więc statystyka jest
+    aktualna z dokładnością do okna. Zwraca liczbę zapisanych serii (0 bez rekordera).
+    """
+    try:
+        from homeassistant.components.recorder.statistics import async_add_external_statistics
+    except ImportError:
+        return 0
+    try:
+        from homeassistant.components.recorder.models import StatisticMeanType
+    except ImportError:
+        # Starsze wersje HA: typ średniej wynika z flagi has_mean.
+        mean_type: Dict[str, Any] = {"has_mean": True}
+    else:
+        mean_type = {"mean_type": StatisticMeanType.ARITHMETIC}
+
+    start = datetime.fromtimestamp(hour.start, timezone.utc)
+    written = 0
+    for desc in descriptors:
+        slot = desc.slot
+        mean = hour.mean(slot)
+        if mean is None:
+            continue
+        metadata = {
+            "has_sum": False,
+            "name": f"{name} {desc.name}",
+            "source": prefix.partition(":")[0],
+            "statistic_id": statistic_id(prefix, f"{unit_key}{desc.key or desc.address}"),
+            "unit_of_measurement": desc.unit,
+            **mean_type,
+        }
+        row = {"start": start, "mean": mean, "min": hour.min[slot], "max": hour.max[slot]}
+        try:
+            async_add_external_statistics(hass, metadata, [row])
+        except Exception as err:
+            # Rekorder wyłączony albo niezgodna wersja - encje i tak dostają agregaty okna.
+            _LOGGER.debug("ORNO: nie zapisano statystyk %s: %s", metadata["statistic_id"], err)
+            return written
+        written += 1
+    return written
@@ -0,0 +1,259 @@
+"""Benchmark ścieżki odpytywania ORNO 517 względem lokalnego symulatora.
+
+Uruchamia `tools/orno_simulator.py` jako podproces (albo łączy się z podanym host:port)
+i mierzy dla N pełnych cykli odczytu:
+  * opóźnienie cyklu (p50 / p99 / max),
+  * liczbę zapytań Modbus i odczytanych rejestrów na cykl,
+  * czas CPU procesu klienta na jedną zdekodowaną wartość.
+
+Tryby:
+  legacy       - jedno zapytanie na definicję z profilu (zachowanie sprzed planu blokowego),
+  coordinator  - pełny cykl OrnoCoordinator (plan blokowy + dekoder), wszystkie klasy naraz,
+                 przegląd wszystkich jednostek z `--units` przez wspólną kolejkę bramki;
+                 z `--derived` wartości pochodne z profilu są liczone lokalnie.
+
+    python tools/benchmark.py --polls 200 --latency 40 --jitter 20
+    python tools/benchmark.py --mode legacy --framing rtu_over_tcp --latency 30
+    python tools/benchmark.py --units 1-16 --latency 15 --max-in-flight 4
+    python tools/benchmark.py --latency 20 --capture /tmp/orno.cap
+    python tools/benchmark.py --replay /tmp/orno.cap --speed 0
+
+`--capture` zapisuje ramki z przebiegu do pliku (format jak usługa `orno_517.save_capture`),
+a `--replay` zamiast symulatora odtwarza nagranie przez ten sam koordynator: z nagranymi
+opóźnieniami (`--speed 1`) albo bez opóźnień (`--speed 0`) - deterministycznie, bez licznika.
+
+Wymaga zainstalowanego Home Assistant (tryb `coordinator` używa klasy koordynatora).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, _ROOT)
+
+from custom_components.orno_517.const import DEFAULT_PROFILE, PROFILES, parse_unit_ids  # noqa: E402
+from custom_components.orno_517.coordinator import OrnoCoordinator  # noqa: E402
+from custom_components.orno_517.gateway import ModbusGateway  # noqa: E402
+from custom_components.orno_517.modbus_client import (  # noqa: E402
+    FC_READ_HOLDING_REGISTERS,
+    FC_READ_INPUT_REGISTERS,
+    FRAMING_TCP,
+    FRAMINGS,
+    ModbusTcpClient,
+)
+from custom_components.orno_517.capture import FrameCapture, ReplayClient  # noqa: E402
+from custom_components.orno_517.profiles import DeviceProfile, load_profile  # noqa: E402
+from custom_components.orno_517.read_plan import build_read_plan  # noqa: E402
+
+
+class CountingClient:
+    """Opakowanie klienta liczące zapytania i rejestry wysłane w bieżącym cyklu."""
+
+    def __init__(self, client: Any) -> None:
+        self.client = client
+        self.requests = 0
+        self.registers = 0
+
+    async def read_registers(self, function: int, address: int, count: int, *args: Any, **kwargs: Any) -> memoryview:
+        self.requests += 1
+        self.registers += count
+        return await self.client.read_registers(function, address, count, *args, **kwargs)
+
+
+class _Counters:
+    """Wspólny licznik zapytań dla wszystkich jednostek przeglądu."""
+
+    def __init__(self, units: Dict[int, CountingClient]) -> None:
+        self.units = units
+
+    @property
+    def requests(self) -> int:
+        return sum(c.requests for c in self.units.values())
+
+    @requests.setter
+    def requests(self, value: int) -> None:
+        for c in self.units.values():
+            c.requests = value
+
+    @property
+    def registers(self) -> int:
+        return sum(c.registers for c in self.units.values())
+
+    @registers.setter
+    def registers(self, value: int) -> None:
+        for c in self.units.values():
+            c.registers = value
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _poll_legacy(client: CountingClient, profile: DeviceProfile) -> int:
+    # Jedno zapytanie na rejestr, jak przed planem blokowym.
+    values = 0
+    for block in build_read_plan(profile.defs, max_gap=0, max_count=2):
+        function = FC_READ_HOLDING_REGISTERS if block.input_type == "holding" else FC_READ_INPUT_REGISTERS
+        try:
+            regs = await client.read_registers(function, block.address, block.count)
+        except Exception:
+            continue
+        values += len(block.decoder.decode(regs))
+    return values
+
+
+async def _start_simulator(args: argparse.Namespace) -> tuple[asyncio.subprocess.Process, int]:
+    cmd = [
+        sys.executable, os.path.join(_ROOT, "tools", "orno_simulator.py"),
+        "--units", args.units, "--framing", args.framing,
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--drop", str(args.drop), "--exceptions", str(args.exceptions),
+        "--profile", args.profile,
+    ]
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE)
+    line = await asyncio.wait_for(proc.stdout.readline(), timeout=30)
+    if not line.startswith(b"LISTENING"):
+        proc.kill()
+        raise RuntimeError(f"Symulator nie wystartował: {line!r}")
+    return proc, int(line.split()[1])
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    proc = None
+    host, port = args.host, args.port
+    units = parse_unit_ids(args.units)
+    profile = load_profile(args.profile)
+    if args.replay:
+        with open(args.replay, "rb") as f:
+            raw = ReplayClient(f.read(), speed=args.speed, timeout=args.timeout)
+    else:
+        if not port:
+            proc, port = await _start_simulator(args)
+            host = "127.0.0.1"
+        raw = ModbusTcpClient(
+            host, port, unit_id=units[0], timeout=args.timeout,
+            max_in_flight=args.max_in_flight, framing=args.framing,
+        )
+        if args.capture:
+            raw.capture = FrameCapture(args.framing, max_bytes=64 * 1024 * 1024)
+    gateway = ModbusGateway(host, port, raw)
+    clients = {u: CountingClient(gateway.unit(u)) for u in units}
+    client = _Counters(clients)
+    coordinator = None
+    if args.mode == "coordinator":
+        coordinator = OrnoCoordinator(
+            None, clients, profile, scan_interval_s=15, max_gap=args.max_gap, derived=args.derived,
+        )
+
+    # Wartości publikowane w trakcie cyklu (bloki gotowe przed pozostałymi) trafiają do encji
+    # przez słuchaczy kluczy, a nie przez updated_keys na końcu cyklu.
+    partial = 0
+
+    def _count_partial() -> None:
+        nonlocal partial
+        partial += 1
+
+    if coordinator is not None:
+        for unit_id in units:
+            for desc in coordinator.descriptors:
+                coordinator.async_add_key_listener((unit_id, desc.slot), _count_partial)
+
+    latencies: List[float] = []
+    requests: List[int] = []
+    registers: List[int] = []
+    cpu_total = 0.0
+    values_total = 0
+    failures = 0
+    try:
+        await raw.connect()
+        t0 = time.perf_counter()
+        for i in range(args.warmup + args.polls):
+            if i and args.interval:
+                await asyncio.sleep(max(0.0, args.interval / 1000 - (time.perf_counter() - t0)))
+            client.requests = 0
+            client.registers = 0
+            cpu0, t0 = time.process_time(), time.perf_counter()
+            try:
+                if coordinator is not None:
+                    coordinator.mark_all_due()
+                    coordinator.data = None
+                    partial = 0
+                    await coordinator._async_update_data()
+                    values = len(coordinator.updated_keys) + partial
+                else:
+                    values = await _poll_legacy(clients[units[0]], profile)
+            except Exception:
+                failures += 1
+                values = 0
+            elapsed, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+            if i < args.warmup:
+                continue
+            latencies.append(elapsed * 1000)
+            requests.append(client.requests)
+            registers.append(client.registers)
+            cpu_total += cpu
+            values_total += values
+    finally:
+        if raw.capture is not None:
+            raw.capture.write(args.capture)
+        await gateway.close()
+        if proc is not None:
+            proc.terminate()
+            await proc.wait()
+
+    return {
+        "mode": args.mode,
+        "derived": args.derived,
+        "framing": raw.framing,
+        "replay": args.replay,
+        "profile": args.profile,
+        "units": len(units),
+        "polls": len(latencies),
+        "failed_polls": failures,
+        "latency_ms_p50": round(_percentile(latencies, 50), 3),
+        "latency_ms_p99": round(_percentile(latencies, 99), 3),
+        "latency_ms_max": round(max(latencies), 3),
+        "requests_per_poll": round(statistics.mean(requests), 2),
+        "registers_per_poll": round(statistics.mean(registers), 2),
+        "values_per_poll": round(values_total / max(1, len(latencies)), 2),
+        "cpu_us_per_value": round(cpu_total * 1e6 / max(1, values_total), 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("coordinator", "legacy"), default="coordinator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 = uruchom własny symulator")
+    parser.add_argument("--units", default="2", help="np. 2 lub 1-16 (tryb legacy odpytuje tylko pierwszą)")
+    parser.add_argument("--framing", choices=FRAMINGS, default=FRAMING_TCP)
+    parser.add_argument("--profile", choices=list(PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument("--derived", action="store_true", help="wartości pochodne liczone lokalnie")
+    parser.add_argument("--polls", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=0.0, help="odstęp między początkami cykli [ms]")
+    parser.add_argument("--timeout", type=float, default=3.0)
+    parser.add_argument("--max-gap", type=int, default=8)
+    parser.add_argument("--max-in-flight", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="opóźnienie symulatora [ms]")
+    parser.add_argument("--jitter", type=float, default=0.0, help="jitter symulatora [ms]")
+    parser.add_argument("--drop", type=float, default=0.0)
+    parser.add_argument("--exceptions", type=float, default=0.0)
+    parser.add_argument("--capture", help="zapisz ramki do pliku nagrania")
+    parser.add_argument("--replay", help="odtwórz plik nagrania zamiast symulatora")
+    parser.add_argument("--speed", type=float, default=1.0, help="tempo odtwarzania (0 = bez opóźnień)")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(_run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Lokalny symulator licznika ORNO OR-WE-517 (Modbus TCP lub RTU-over-TCP).
+
+Mapa rejestrów budowana jest z profilu urządzenia integracji (`--profile`, domyślnie or_we_517). Symulator pozwala ustawić
+opóźnienie i jitter odpowiedzi, odsetek gubionych ramek oraz odpowiedzi z wyjątkiem,
+dzięki czemu benchmark (`tools/benchmark.py`) można uruchamiać bez fizycznego licznika.
+
+    python tools/orno_simulator.py --port 4196 --latency 40 --jitter 20 --drop 0.01
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import struct
+import sys
+import types
+from typing import Dict, Iterable, Set
+
+_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, _ROOT)
+
+# Symulator korzysta tylko z modułów bez zależności od Home Assistant (stałe, ramkowanie
+# i CRC, profile). Pakiet integracji jest rejestrowany bez wykonywania jego __init__, który
+# importuje HA - dzięki temu symulator działa w czystym Pythonie.
+if "custom_components.orno_517" not in sys.modules:
+    _package = types.ModuleType("custom_components.orno_517")
+    _package.__path__ = [os.path.join(_ROOT, "custom_components", "orno_517")]
+    sys.modules["custom_components.orno_517"] = _package
+
+from custom_components.orno_517.const import (  # noqa: E402
+    DEFAULT_PROFILE,
+    DISCOVERY_REGISTER,
+    PROFILES,
+    parse_unit_ids,
+)
+from custom_components.orno_517.modbus_client import (  # noqa: E402
+    FRAMING_RTU_OVER_TCP,
+    FRAMING_TCP,
+    FRAMINGS,
+    crc16,
+)
+from custom_components.orno_517.profiles import load_profile  # noqa: E402
+
+_LOGGER = logging.getLogger("orno_simulator")
+
+# Typowe wartości dla jednostek z mapy; pozostałe rejestry rosną jak liczniki energii.
+_NOMINAL = {"V": 230.0, "Hz": 50.0, "A": 5.0, "kW": 1.1, "kvar": 0.2, "kVA": 1.2, "": 0.95}
+
+_EXC_ILLEGAL_ADDRESS = 2
+_EXC_DEVICE_FAILURE = 4
+
+
+class MeterModel:
+    """Obraz rejestrów jednego licznika, odświeżany przy każdym odczycie."""
+
+    def __init__(self, defs: Iterable[dict], meter_id: int = 0) -> None:
+        self._defs = list(defs)
+        top = max(int(d["address"]) + 2 for d in self._defs)
+        self._image = bytearray(top * 2)
+        # Identyfikator licznika (rejestr 2) - używany przez wyszukiwanie jednostek.
+        struct.pack_into(">H", self._image, DISCOVERY_REGISTER * 2, meter_id)
+        self._energy = 0.0
+        self.refresh()
+
+    @property
+    def size(self) -> int:
+        return len(self._image) // 2
+
+    def refresh(self) -> None:
+        self._energy += random.uniform(0.0, 0.01)
+        for d in self._defs:
+            nominal = _NOMINAL.get(d.get("unit") or "", None)
+            value = self._energy if nominal is None else nominal * random.uniform(0.97, 1.03)
+            dtype = d.get("dtype") or d.get("data_type", "uint16")
+            scale = float(d.get("scale", 1.0)) or 1.0
+            offset = int(d["address"]) * 2
+            if dtype == "float32":
+                raw = struct.pack(">f", value)
+            elif dtype in ("uint32", "int32"):
+                raw = struct.pack(">i" if dtype == "int32" else ">I", int(value / scale))
+            else:
+                raw = struct.pack(">h" if dtype == "int16" else ">H", int(value / scale) & 0xFFFF)
+            if d.get("word_swap") and len(raw) == 4:
+                raw = raw[2:] + raw[:2]
+            self._image[offset:offset + len(raw)] = raw
+
+    def read(self, address: int, count: int) -> bytes | None:
+        if address + count > self.size:
+            return None
+        return bytes(self._image[address * 2:(address + count) * 2])
+
+
+class MeterSimulator:
+    """Serwer asyncio odpowiadający na FC03/FC04 jak licznik (lub kilka liczników) za bramką."""
+
+    def __init__(
+        self,
+        units: Set[int],
+        framing: str = FRAMING_TCP,
+        profile: str = DEFAULT_PROFILE,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        drop_rate: float = 0.0,
+        exception_rate: float = 0.0,
+        serial: bool = True,
+    ) -> None:
+        self.units = units
+        self.framing = framing
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.drop_rate = drop_rate
+        self.exception_rate = exception_rate
+        defs = load_profile(profile).defs
+        self.meters: Dict[int, MeterModel] = {u: MeterModel(defs, meter_id=u) for u in units}
+        # Prawdziwa magistrala RS485 obsługuje jedno zapytanie naraz.
+        self._bus = asyncio.Lock() if serial else None
+        self.requests = 0
+
+    def _respond(self, unit: int, function: int, address: int, count: int) -> bytes | None:
+        meter = self.meters.get(unit)
+        if meter is None:
+            return None
+        if random.random() < self.exception_rate:
+            return bytes((function | 0x80, _EXC_DEVICE_FAILURE))
+        if function not in (3, 4):
+            return bytes((function | 0x80, 1))
+        meter.refresh()
+        payload = meter.read(address, count)
+        if payload is None:
+            return bytes((function | 0x80, _EXC_ILLEGAL_ADDRESS))
+        return bytes((function, len(payload))) + payload
+
+    async def _answer(self, writer: asyncio.StreamWriter, tid: int, unit: int, pdu: bytes) -> None:
+        async def _work() -> bytes | None:
+            await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+            if random.random() < self.drop_rate:
+                return None
+            function, address, count = struct.unpack(">BHH", pdu[:5])
+            return self._respond(unit, function, address, count)
+
+        if self._bus:
+            async with self._bus:
+                reply = await _work()
+        else:
+            reply = await _work()
+        if reply is None or writer.is_closing():
+            return
+        if self.framing == FRAMING_RTU_OVER_TCP:
+            frame = bytes((unit,)) + reply
+            writer.write(frame + struct.pack("<H", crc16(frame)))
+        else:
+            writer.write(struct.pack(">HHHB", tid, 0, len(reply) + 1, unit) + reply)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        tasks: Set[asyncio.Task] = set()
+        try:
+            while True:
+                if self.framing == FRAMING_RTU_OVER_TCP:
+                    frame = await reader.readexactly(8)
+                    if crc16(frame[:6]) != struct.unpack("<H", frame[6:])[0]:
+                        continue
+                    tid, unit, pdu = 0, frame[0], frame[1:6]
+                else:
+                    tid, _, length, unit = struct.unpack(">HHHB", await reader.readexactly(7))
+                    pdu = await reader.readexactly(length - 1)
+                self.requests += 1
+                task = asyncio.get_running_loop().create_task(self._answer(writer, tid, unit, pdu))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    sim = MeterSimulator(
+        set(parse_unit_ids(args.units)),
+        framing=args.framing,
+        latency_ms=args.latency,
+        jitter_ms=args.jitter,
+        drop_rate=args.drop,
+        exception_rate=args.exceptions,
+        serial=not args.parallel,
+        profile=args.profile,
+    )
+    server = await sim.start(args.host, args.port)
+    port = server.sockets[0].getsockname()[1]
+    # Benchmark odczytuje port z tej linii, gdy uruchamia symulator jako podproces.
+    print(f"LISTENING {port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 = wolny port")
+    parser.add_argument("--units", default="2", help="np. 2 lub 1-16 lub 1,2,5")
+    parser.add_argument("--framing", choices=FRAMINGS, default=FRAMING_TCP)
+    parser.add_argument("--profile", choices=list(PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument("--latency", type=float, default=0.0, help="opóźnienie odpowiedzi [ms]")
+    parser.add_argument("--jitter", type=float, default=0.0, help="jitter opóźnienia (+/-) [ms]")
+    parser.add_argument("--drop", type=float, default=0.0, help="odsetek gubionych odpowiedzi (0-1)")
+    parser.add_argument("--exceptions", type=float, default=0.0, help="odsetek odpowiedzi z wyjątkiem (0-1)")
+    parser.add_argument("--parallel", action="store_true", help="odpowiadaj równolegle (bez kolejki RS485)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()